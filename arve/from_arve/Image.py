@@ -16,11 +16,35 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this software.  If not, see <http://www.gnu.org/licenses/>.
 """
+import os
+import copy
 import numpy as np
 import UVspec
 import matplotlib.pyplot as plt
 from scipy import ndimage
 
+def ReadRadspcColumns(fn):
+    """
+    Read all columns of MYSTIC rad.spc file (wvl, ix, iy, iz, rad
+    and, if mc_std is set, std) into array of shape (nlines, ncols).
+    """
+    if np.lib.NumpyVersion(np.__version__) >= '1.23.0':
+        # loadtxt is implemented in C since numpy 1.23
+        return np.loadtxt(fn, ndmin=2)
+    f = open(fn,'r')
+    ncols = len(f.readline().split())
+    f.seek(0)
+    data = np.array(f.read().split(), dtype=float)
+    f.close()
+    return data.reshape(-1, ncols)
+
+def RadspcCacheFile(fn):
+    """
+    Name of binary cache file of MYSTIC rad.spc file (see
+    Image.ReadMYSTICradspcfile).
+    """
+    return fn+'.cache.npy'
+
 class Image:
 
     def __init__(self):
@@ -38,7 +62,8 @@ class Image:
         return
 
     def ReadMYSTICradspcfile(self, fn, flip_y=False, Filter=None, RemoveGhosts=False,
-                             AddRows=False,  timestart='005'):
+                             AddRows=False,  timestart='005', bulk=True,
+                             cache=False):
         """
         Input is uvspec output file name as provided by MYSTIC.
         See libRadtran documentation for details, specifically
@@ -51,27 +76,48 @@ class Image:
 
         The latter is only set if mc_std is included in
         uvspec input file.
+
+        If bulk is True, the whole file is read in one call and
+        scattered into the image with index arrays (see
+        _scatter_radspc), else it is read line by line.
+
+        If cache is True (default False), rad and std (before flip_y,
+        Filter, etc.) are stored in a binary file next to the input
+        file (see RadspcCacheFile), which is memory mapped instead of
+        reading the input file, as long as modification time and size
+        of the input file do not change.
         """
-        RAD = np.zeros((self.ny,self.nx,self.nrgb))
-        STD = np.zeros((self.ny,self.nx,self.nrgb))
         self.fn=fn
-        f  = open(fn,'r')
-        ir = 0
-        it = 0
-        for line in f:
-            ls = line.split()
-            ix = int(ls[1])
-            iy = int(ls[2])
-            RAD[iy,ix,ir] = float(ls[4])
-            if  len(ls) > 5:
-                STD[iy,ix,ir] = float(ls[5])
-
-            if self.nrgb == 3 and it >= self.ny*self.nx:
-                ir = ir + 1
-                it = 0
-            else:
-                it = it + 1
-        f.close()
+        cachefile = RadspcCacheFile(fn)
+        cached = None
+        if cache:
+            cached = self._read_radspc_cache(fn, cachefile)
+        if cached is not None:
+            RAD, STD = cached
+        elif bulk:
+            RAD, STD = self._scatter_radspc(ReadRadspcColumns(fn))
+        else:
+            RAD = np.zeros((self.ny,self.nx,self.nrgb))
+            STD = np.zeros((self.ny,self.nx,self.nrgb))
+            f  = open(fn,'r')
+            ir = 0
+            it = 0
+            for line in f:
+                ls = line.split()
+                ix = int(ls[1])
+                iy = int(ls[2])
+                RAD[iy,ix,ir] = float(ls[4])
+                if  len(ls) > 5:
+                    STD[iy,ix,ir] = float(ls[5])
+
+                if self.nrgb == 3 and it >= self.ny*self.nx:
+                    ir = ir + 1
+                    it = 0
+                else:
+                    it = it + 1
+            f.close()
+        if cache and cached is None:
+            self._write_radspc_cache(fn, cachefile, RAD, STD)
         if self.nrgb==1:
             self.rad = RAD[:,:,0]
             self.std = STD[:,:,0]
@@ -85,6 +131,26 @@ class Image:
         if Filter != None:
             self.rad = ndimage.gaussian_filter(self.rad, sigma=0.75)
 
+        self._postprocess(RemoveGhosts, AddRows, timestart)
+
+    def PostprocessedCopy(self, RemoveGhosts=False, AddRows=False,
+                          timestart='005'):
+        """
+        Returns copy of image (as read by ReadMYSTICradspcfile with
+        RemoveGhosts=False and AddRows=False) with ghosts removed
+        and/or rows added. Allows to read an image once and use it
+        for several timesteps, since ghost removal depends on timestart.
+        """
+        img = copy.copy(self)
+        img.rad = self.rad.copy()
+        img.std = self.std.copy()
+        img._postprocess(RemoveGhosts, AddRows, timestart)
+        return img
+
+    def _postprocess(self, RemoveGhosts, AddRows, timestart):
+        """
+        Remove ghosts (depends on timestart) and add rows to image.
+        """
         if RemoveGhosts:
             print "timestart", timestart
             if timestart=='001':
@@ -114,6 +180,88 @@ class Image:
             self.rad = tmpRAD
             self.std = tmpSTD
 
+    def _scatter_radspc(self, data):
+        """
+        Scatter columns of MYSTIC rad.spc file (see ReadRadspcColumns)
+        into radiance and std arrays of shape (ny, nx, nrgb).
+
+        Channels are assigned as in the line by line reader, i.e. for
+        nrgb == 3 the channel is increased after every ny*nx+1 lines.
+        If a pixel occurs several times, the last line is used.
+        """
+        RAD = np.zeros((self.ny,self.nx,self.nrgb))
+        STD = np.zeros((self.ny,self.nx,self.nrgb))
+        ix = data[:,1].astype(int)
+        iy = data[:,2].astype(int)
+        if self.nrgb == 3:
+            ir = np.arange(len(data)) // (self.ny*self.nx+1)
+        else:
+            ir = np.zeros(len(data), dtype=int)
+        flat = np.ravel_multi_index((iy, ix, ir), RAD.shape)
+        # index of last occurrence of each pixel
+        _, last = np.unique(flat[::-1], return_index=True)
+        keep = len(flat) - 1 - last
+        RAD.flat[flat[keep]] = data[keep,4]
+        if data.shape[1] > 5:
+            STD.flat[flat[keep]] = data[keep,5]
+        return RAD, STD
+
+    def _read_radspc_cache(self, fn, cachefile):
+        """
+        Memory map rad and std arrays of shape (ny, nx, nrgb) from
+        cache file of MYSTIC rad.spc file fn. Pages are copied on
+        write, i.e. the cache file is never modified.
+
+        Returns None if there is no valid cache file.
+        """
+        if not os.path.exists(cachefile):
+            return None
+        st = os.stat(fn)
+        try:
+            cache = np.load(cachefile, mmap_mode='c')
+        except (IOError, ValueError):
+            return None
+        shape = (self.ny,self.nx,self.nrgb)
+        if (cache.shape != (1,) or
+            cache.dtype.names != ('mtime', 'size', 'rad', 'std') or
+            cache.dtype['rad'].shape != shape or
+            cache['mtime'][0] != st.st_mtime or
+            cache['size'][0] != st.st_size):
+            return None
+        return cache['rad'][0], cache['std'][0]
+
+    def _write_radspc_cache(self, fn, cachefile, RAD, STD):
+        """
+        Write rad and std arrays and modification time and size of
+        MYSTIC rad.spc file fn to cache file. Failures (e.g. read only
+        directory) are reported, but do not stop reading.
+        """
+        st = os.stat(fn)
+        dtype = np.dtype([('mtime', 'f8'), ('size', 'i8'),
+                          ('rad', 'f8', RAD.shape), ('std', 'f8', STD.shape)])
+        cache = np.zeros(1, dtype=dtype)
+        cache['mtime'] = st.st_mtime
+        cache['size'] = st.st_size
+        cache['rad'][0] = RAD
+        cache['std'][0] = STD
+        # write to temporary file first, so that other processes never
+        # see incomplete cache files
+        tmp = '{:s}.{:d}.tmp'.format(cachefile, os.getpid())
+        try:
+            f = open(tmp, 'wb')
+            try:
+                np.save(f, cache)
+            finally:
+                f.close()
+            if os.path.exists(cachefile):
+                # os.rename does not replace existing files on Windows
+                os.remove(cachefile)
+            os.rename(tmp, cachefile)
+        except (IOError, OSError) as e:
+            print "Could not write cache file {:s}: {:s}".format(cachefile, str(e))
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
     def MYSTIC_statistics(self, std_limit=0.01, verbose=True):
         indx=np.where(self.std/self.rad< std_limit )
         npix=len(indx[0])
@@ -134,12 +282,11 @@ class Image:
         Their definitions are given in the libRadtran user's guide
         for the options mc_sample_grid and mc_sensorposition.
 
-        Note that this function does not work properly if comments
-        included on the same line as the above options, in the
-        uvspec input file given as input.
+        The input file is read once (see UVspec.read_input_file).
          """
 
-        vals = UVspec.get_vals(fi,'mc_sample_grid')
+        inp = UVspec.read_input_file(fi)
+        vals = inp.get('mc_sample_grid')
         if len(vals) == 2:
             self.nx = int(vals[0])
             self.ny = int(vals[1])
@@ -148,7 +295,7 @@ class Image:
             print "Input file ",fi, " did not contain mc_sample_grid"
             print "This is not a panorama input file. Exiting."
             exit(0)
-        vals = UVspec.get_vals(fi,'mc_panorama_view')
+        vals = inp.get('mc_panorama_view')
         if len(vals) == 4:
             self.phi1 = float(vals[0])
             self.phi2 = float(vals[1])
@@ -161,7 +308,7 @@ class Image:
             print "This is not a panorama input file. Exiting."
             exit(0)
 
-        vals = UVspec.get_vals(fi,'umu')
+        vals = inp.get('umu')
         if len(vals) == 1:
             self.umu = float(vals[0])
 
@@ -171,7 +318,7 @@ class Image:
             self.theta1 = self.theta1-self.thetacenter + self.umudeg
             self.theta2 = self.theta2-self.thetacenter + self.umudeg
 
-        vals = UVspec.get_vals(fi,'mc_panorama_alignment')
+        vals = inp.get('mc_panorama_alignment')
         if len(vals)== 1:
             self.mc_panorama_alignment=True
         else:
@@ -180,20 +327,20 @@ class Image:
             print "Sure this is correct?"
 
 
-        vals = UVspec.get_vals(fi,'mc_sensorposition')
+        vals = inp.get('mc_sensorposition')
         if len(vals) == 3:
             self.xpos     = float(vals[0])
             self.ypos     = float(vals[1])
             self.altitude = float(vals[2])
 
 
-        vals = UVspec.get_vals(fi,'source')
+        vals = inp.get('source')
         if vals[0] == 'thermal':
             self.thermal=True
         else:
             self.thermal=False
 
-        vals = UVspec.get_vals(fi,'output')
+        vals = inp.get('output')
         self.nrgb = 1
 
         if len(vals) == 1:
@@ -5,6 +5,7 @@ import numpy as np
 import multiprocessing
 from subprocess import Popen,PIPE, STDOUT, call
 from glob import glob
+from collections import OrderedDict
 import time
 
 # Where are we
@@ -121,6 +122,74 @@ def zenith(lat, lon, year, month, day,hour,min=0, sec=0, stdlong=0,output=1, uvs
     return sza
 
 
+class InputFile:
+    """ Options of uvspec input file, read in a single pass.
+
+        Usage:
+
+        inp = InputFile(input_filename)
+        values = inp.get(optionname)
+
+        Each non-empty line (comments starting with # are removed) is
+        split into words, the first word is the option name and the
+        remaining words are its values. If an option occurs several
+        times, the last occurrence is used (as uvspec does).
+
+        Use read_input_file to get the (memoised) model of a file.
+    """
+    def __init__(self, fn):
+        self.fn = fn
+        self.lines = []
+        self.options = OrderedDict()
+        f = open(fn,'r')
+        for line in f:
+            l = line.split('#')[0].split()
+            if len(l) == 0:
+                continue
+            self.lines.append(l)
+            self.options[l[0]] = l[1:]
+        f.close()
+        return
+
+    def get(self, option, default=''):
+        """ Returns list of values of option, or default if option
+            is not set. Names of options with several words (e.g.
+            'profile_properties Plumeixepy') must match the first
+            words of a line.
+        """
+        words = option.split()
+        if len(words) == 1:
+            if words[0] in self.options:
+                return list(self.options[words[0]])
+            return default
+        nopts = len(words)
+        vals = default
+        for l in self.lines:
+            if l[0:nopts] == words:
+                vals = l[nopts:]
+        return vals
+
+    def __contains__(self, option):
+        return self.get(option, None) is not None
+
+# Memoised InputFile objects, keys are file paths, values are tuples
+# (mtime, size, InputFile)
+_input_files = {}
+
+def read_input_file(fn):
+    """ Returns InputFile for uvspec input file. The file is only read
+        again if its modification time or size has changed since the
+        last call.
+    """
+    key = os.path.abspath(fn)
+    st = os.stat(key)
+    cached = _input_files.get(key)
+    if cached is not None and cached[0:2] == (st.st_mtime, st.st_size):
+        return cached[2]
+    inp = InputFile(fn)
+    _input_files[key] = (st.st_mtime, st.st_size, inp)
+    return inp
+
 def get_vals(fn,option):
     """ Returns the values for option in an input file.
 
@@ -139,21 +208,7 @@ def get_vals(fn,option):
         Date:   2011-05-23
     """
 
-    f  = open(fn,'r')
-    vals = ''
-    for line in f:
-        l = line.split()
-# This does not work with the new input options.....
-#        if ( l[0] == option ):
-#            vals = l[1:len(l)]
-#        print l, option
-        if option in line:
-            nopts = len(option.split())
-            vals = l[nopts:len(l)]
-#            print l, option, nopts, vals
-
-    f.close()
-    return vals
+    return read_input_file(fn).get(option)
 
 
 def Average_spc_Files(InputFiles, OutputFile, verbose=False):
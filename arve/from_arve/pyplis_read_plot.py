@@ -30,6 +30,12 @@ import sys
 import Experiment as Exp
 from glob import glob
 import copy
+import multiprocessing
+try:
+    import resource
+    resource_available = True
+except ImportError:
+    resource_available = False
 
 FONTSIZE=20
 
@@ -201,124 +207,128 @@ def plot_histo_result(flow, lines):
     #fig.tight_layout()
     return fig
 
-def Centerline(xs, ys, col2d):
-    # Equation from Dosio and de Arellano (2006).
-    Centerline = np.zeros(xs.shape[0])
-    for i in (list(range(xs.shape[0]))):
-        colsum= np.sum(col2d[:,i])
-        if colsum > 0.0:
-            Centerline[i] = np.sum(ys*col2d[:,i])/colsum
+def _column_moments(ys, col2d):
+    """Column sums and moments of ys weighted by col2d, for all columns
+
+    The moments are computed about the mean of ys (to reduce round off
+    errors) with a single matrix product.
+
+    Returns
+    -------
+    tuple
+        reference value of ys and array of shape (4, ncols) with column
+        sums and first to third moments about reference value
+    """
+    ref = np.mean(ys)
+    t = ys - ref
+    powers = np.vstack([np.ones_like(t), t, t*t, t*t*t])
+    return ref, np.dot(powers, col2d)
+
+def _central_moments(ref, moments, center):
+    """Second and third moments (not normalised) about center (scalar or
+    one value per column), computed from moments about ref"""
+    T0, T1, T2, T3 = moments
+    a = center - ref
+    M2 = T2 - 2*a*T1 + a*a*T0
+    M3 = T3 - 3*a*T2 + 3*a*a*T1 - a*a*a*T0
+    return M2, M3
+
+def _dispersion(ref, moments, center, mask):
+    """sqrt of second moment about center, normalised by column sum, where
+    mask is True, else 0
+
+    As in the column loops, negative variances (possible for negative
+    pixel values) give NaN. Only negatives within round-off of the
+    binomial expansion in _central_moments (true variance 0) are set to 0.
+    """
+    T0, T1, T2, _ = moments
+    a = center - ref
+    M2, _ = _central_moments(ref, moments, center)
+    roundoff = 64*np.finfo(float).eps*(np.abs(T2) + np.abs(2*a*T1) + np.abs(a*a*T0))
+    M2 = np.where((M2 < 0.0) & (M2 >= -roundoff), 0.0, M2)
+    with np.errstate(invalid='ignore'):
+        return np.sqrt(_masked_ratio(M2, T0, mask))
+
+def _masked_ratio(num, den, mask):
+    """num/den where mask is True, else 0"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(mask, num/den, 0.0)
+
+def PlumeMoments(xs, ys, col2d):
+    """Plume statistics for all image columns (Dosio and de Arellano 2006)
+
+    Fused version of Centerline, AbsoluteDispersion, RelativeDispersion,
+    AbsoluteSkewness and Skewness: column sums and weighted moments are
+    computed once, for all columns. Columns with sum <= 0 are set to 0.
+
+    Parameters
+    ----------
+    xs : ndarray
+        x pixel coordinates (one per image column)
+    ys : ndarray
+        y pixel coordinates (one per image row)
+    col2d : ndarray
+        image (column densities)
 
-    # This is shorter, but gives problems for colsum==0
-    #    Centerline = np.array([np.sum(ys*col2d[:,i])/np.sum(col2d[:,i]) for i in (list(range(xs.shape[0])))])
+    Returns
+    -------
+    dict
+        Centerline, mean (of Centerline), Dispersion (absolute),
+        RelativeDispersion, AbsoluteSkewness and Skewness (normalised by
+        Dispersion**3 as in Img.statistics, 0 where Dispersion is 0)
+    """
+    ref, moments = _column_moments(ys, col2d[:, :xs.shape[0]])
+    colsum = moments[0]
+    mask = colsum > 0.0
+
+    centerline = np.where(mask, ref + _masked_ratio(moments[1], colsum, mask), 0.0)
+    mean = np.nanmean(centerline)
+
+    _, M3 = _central_moments(ref, moments, mean)
+    dispersion = _dispersion(ref, moments, mean, mask)
+    rel_dispersion = _dispersion(ref, moments, centerline, mask)
+
+    abs_skew = _masked_ratio(M3, colsum, mask)
+    skew = _masked_ratio(abs_skew, np.power(dispersion, 1.5), mask)
+    disp3 = np.power(dispersion, 3)
+    normalised = disp3 > 0.0
+    return dict(Centerline=centerline,
+                mean=mean,
+                Dispersion=dispersion,
+                RelativeDispersion=rel_dispersion,
+                AbsoluteSkewness=_masked_ratio(abs_skew, disp3, normalised),
+                Skewness=_masked_ratio(skew, disp3, normalised))
 
+def Centerline(xs, ys, col2d):
+    # Equation from Dosio and de Arellano (2006).
+    ref, moments = _column_moments(ys, col2d[:, :xs.shape[0]])
+    mask = moments[0] > 0.0
+    Centerline = np.where(mask, ref + _masked_ratio(moments[1], moments[0], mask), 0.0)
     return Centerline, np.nanmean(Centerline)
 
 def AbsoluteDispersion(xs, ys, col2d, mean):
-    # i=0
-    Dispersion = np.zeros(xs.shape[0])
-    # for x in xs:
-    #     j=0
-    #     sum1=0
-    #     sum2=0
-    #     for y in ys:
-    #         zp=y-mean
-    #         sum1=sum1+zp*zp*col2d[j,i]
-    #         sum2=sum2+col2d[j,i]
-    #         j=j+1
-    #     Dispersion[i]=np.sqrt(sum1/sum2)
-    #     i=i+1
-
-    for i in (list(range(xs.shape[0]))):
-        colsum= np.sum(col2d[:,i])
-        if colsum > 0.0:
-            Dispersion[i] = np.sqrt(np.sum((ys-mean)*(ys-mean)*col2d[:,i])/colsum)
-
-    # This is shorter, but gives problems for colsum==0
-    #Dispersion = np.sqrt(np.array([np.sum((ys-mean)*(ys-mean)*col2d[:,i])/np.sum(col2d[:,i]) for i in (list(range(xs.shape[0])))]))
-
-    return Dispersion
+    ref, moments = _column_moments(ys, col2d[:, :xs.shape[0]])
+    mask = moments[0] > 0.0
+    return _dispersion(ref, moments, mean, mask)
 
 def RelativeDispersion(xs, ys, col2d, yc):
-    # i=0
-    Dispersion = np.zeros(xs.shape[0])
-    # for x in xs:
-    #     j=0
-    #     sum1=0
-    #     sum2=0
-    #     for y in ys:
-    #         zp=y-yc[i]
-    #         sum1=sum1+zp*zp*col2d[j,i]
-    #         sum2=sum2+col2d[j,i]
-    #         j=j+1
-    #     Dispersion[i]=np.sqrt(sum1/sum2)
-    #     i=i+1
-    # print ys.shape, yc.shape
-
-    for i in (list(range(xs.shape[0]))):
-        colsum= np.sum(col2d[:,i])
-        if colsum > 0.0:
-            Dispersion[i] = np.sqrt(np.sum((ys-yc[i])*(ys-yc[i])*col2d[:,i])/colsum)
-
-    # This is shorter, but gives problems for colsum==0
-    #    Dispersion = np.sqrt(np.array([np.sum((ys-yc[i])*(ys-yc[i])*col2d[:,i])/np.sum(col2d[:,i]) for i in (list(range(xs.shape[0])))]))
-
-    return Dispersion
+    ref, moments = _column_moments(ys, col2d[:, :xs.shape[0]])
+    mask = moments[0] > 0.0
+    return _dispersion(ref, moments, yc[:xs.shape[0]], mask)
 
 def Skewness(xs, ys, col2d, mean):
-    #     i=0
-    Skewness  = np.zeros(xs.shape[0])
-    #     for x in xs:
-    #         j=0
-    #         sum1=0
-    #         sum2=0
-    #         for y in ys:
-    #             zp=y-mean
-    #             sum1=sum1+zp*zp*zp*col2d[j,i]
-    #             sum2=sum2+col2d[j,i]
-    #             j=j+1
-    #         Skewness[i]=sum1/sum2
-    # #        Skewness[i]=cubic_root(sum1/sum2)
-    #         i=i+1
-
-    for i in (list(range(xs.shape[0]))):
-        colsum= np.sum(col2d[:,i])
-        if colsum > 0.0:
-            Dispersion = np.sqrt(np.sum((ys-mean)*(ys-mean)*col2d[:,i])/colsum)
-            Skewness[i] = (np.sum((ys-mean)*(ys-mean)*(ys-mean)*col2d[:,i])/colsum)/np.power(Dispersion, 1.5)
-
-    # This is shorter, but gives problems for colsum==0
-    #Dispersion = np.sqrt(np.array([np.sum((ys-mean)*(ys-mean)*col2d[:,i])/np.sum(col2d[:,i]) for i in (list(range(xs.shape[0])))]))
-    #Skewness = np.array([np.sum((ys-mean)*(ys-mean)*(ys-mean)*col2d[:,i])/np.sum(col2d[:,i]) for i in (list(range(xs.shape[0])))])/np.power(Dispersion, 1.5)
-
-    return Skewness
+    ref, moments = _column_moments(ys, col2d[:, :xs.shape[0]])
+    mask = moments[0] > 0.0
+    _, M3 = _central_moments(ref, moments, mean)
+    Dispersion = _dispersion(ref, moments, mean, mask)
+    return _masked_ratio(_masked_ratio(M3, moments[0], mask),
+                         np.power(Dispersion, 1.5), mask)
 
 def AbsoluteSkewness(xs, ys, col2d, mean):
-    #    i=0
-    Skewness  = np.zeros(xs.shape[0])
-    #     for x in xs:
-    #         j=0
-    #         sum1=0
-    #         sum2=0
-    #         for y in ys:
-    #             zp=y-mean
-    #             sum1=sum1+zp*zp*zp*col2d[j,i]
-    #             sum2=sum2+col2d[j,i]
-    #             j=j+1
-    #         Skewness[i]=sum1/sum2
-    # #        Skewness[i]=cubic_root(sum1/sum2)
-    #         i=i+1
-
-    for i in (list(range(xs.shape[0]))):
-        colsum= np.sum(col2d[:,i])
-        if colsum > 0.0:
-            Skewness[i] =np.sum((ys-mean)*(ys-mean)*(ys-mean)*col2d[:,i])/colsum
-
-    # This is shorter, but gives problems for colsum==0
-    #    Skewness = np.array([np.sum((ys-mean)*(ys-mean)*(ys-mean)*col2d[:,i])/np.sum(col2d[:,i]) for i in (list(range(xs.shape[0])))])
-
-    return Skewness
-
+    ref, moments = _column_moments(ys, col2d[:, :xs.shape[0]])
+    mask = moments[0] > 0.0
+    _, M3 = _central_moments(ref, moments, mean)
+    return _masked_ratio(M3, moments[0], mask)
 
 class Img(pyplis.Img):
     def __myinit__(self):
@@ -331,21 +341,13 @@ class Img(pyplis.Img):
         if verbose:
             print "statistics", xp, yp, self.img.shape
 
-        self.Centerline, self.mean = Centerline(xp, yp, self.img)
-        self.Dispersion = AbsoluteDispersion(xp, yp, self.img, self.mean)
-        self.RelativeDispersion = RelativeDispersion(xp, yp, self.img, self.Centerline)
-        self.AbsoluteSkewness = self.Centerline*0.0
-        self.Skewness = self.Centerline*0.0
-        i=0
-        for AbsSkew, Skew, Disp3 in zip(AbsoluteSkewness(xp, yp, self.img, self.mean), Skewness(xp, yp, self.img, self.mean), np.power(self.Dispersion,3)):
-            if Disp3>0.0:
-                self.AbsoluteSkewness[i] = AbsSkew/Disp3
-                self.Skewness[i] = Skew/Disp3
-            i=i+1
-
-        # Simpler, but risk dividing by zero.
-        #        self.AbsoluteSkewness = AbsoluteSkewness(xp, yp, self.img, self.mean)/np.power(self.Dispersion,3)
-        #        self.Skewness = Skewness(xp, yp, self.img, self.mean)/np.power(self.Dispersion,3)
+        moments = PlumeMoments(xp, yp, self.img)
+        self.Centerline = moments["Centerline"]
+        self.mean = moments["mean"]
+        self.Dispersion = moments["Dispersion"]
+        self.RelativeDispersion = moments["RelativeDispersion"]
+        self.AbsoluteSkewness = moments["AbsoluteSkewness"]
+        self.Skewness = moments["Skewness"]
         return
 
     def diff(self, imgB):
@@ -360,13 +362,63 @@ class Img(pyplis.Img):
         return diff
 
 
+def read_MYSTIC_background(filebase, wavelengthA, loc, timestartstr, experimenttype,
+                           wavelengthB, filebaseBG, timestampBG, experimenttypeBG,
+                           flip_y=False, Filter=None, verbose=True, cache=False):
+    """Read background images A0 and B0
+
+    Ghosts are not removed and rows are not added, since this depends on
+    the timestep (see Image.PostprocessedCopy). The file names do not depend
+    on timestartstr, i.e. the returned images can be used for all timesteps
+    (cf. background in load_MYSTIC_image).
+
+    Returns
+    -------
+    tuple
+        Image.Image objects of A0 and B0
+    """
+    uvinp = 'uvspecCamW{:s}{:s}{:s}{:s}.inp'.format(wavelengthA,loc,timestartstr,experimenttype)
+    uvout = 'uvspecCamW{:s}{:s}{:s}{:s}.out'.format(wavelengthA,loc,timestartstr,experimenttype)
+
+    uvspecinputfileA0 = filebaseBG+uvinp
+    uvspecoutputfileA0 = filebaseBG+uvout
+    uvspecinputfileA0=uvspecinputfileA0.replace(loc+timestartstr+experimenttype,loc+timestampBG+experimenttypeBG)
+    uvspecoutputfileA0=uvspecinputfileA0.replace('.inp','.out')
+    if verbose:
+        print "uvspecinputfileA0", uvspecinputfileA0
+        print "uvspecoutputfileA0", uvspecoutputfileA0
+    ImgA0= Image.Image()
+    ImgA0.GetUVSPECImageInputVals(uvspecinputfileA0)
+    ImgA0.ReadMYSTICradspcfile(uvspecoutputfileA0, flip_y=flip_y, Filter=Filter,
+                               RemoveGhosts=False, AddRows=False, cache=cache)
+
+    ImgB0= Image.Image()
+    uvspecinputfileB0 = filebaseBG+uvinp
+    uvspecoutputfileB0 = filebaseBG+uvout
+    uvspecinputfileB0=uvspecinputfileB0.replace(loc+timestartstr+experimenttype,loc+timestampBG+experimenttypeBG)
+    uvspecinputfileB0=uvspecinputfileB0.replace(str(wavelengthA),str(wavelengthB))
+    uvspecoutputfileB0=uvspecinputfileB0.replace('.inp','.out')
+    uvspecoutputfileB0=uvspecoutputfileB0.replace(str(wavelengthA),str(wavelengthB))
+    ImgB0.GetUVSPECImageInputVals(uvspecinputfileB0)
+    ImgB0.ReadMYSTICradspcfile(uvspecoutputfileB0, flip_y=flip_y, Filter=Filter,
+                               RemoveGhosts=False, AddRows=False, cache=cache)
+    return ImgA0, ImgB0
+
+
 def load_MYSTIC_image(filebase, wavelengthA,loc,timestartstr,experimenttype,
                       wavelengthB, filebaseBG, timestampBG,experimenttypeBG,
                       start_acq=datetime.datetime(2016, 10, 10, 13, 15, 12),
                       print_MYSTIC_statistics=True, flip_y=False, Filter=None,
-                      AddRows=False, verbose=True):
+                      AddRows=False, verbose=True, cache=False, background=None):
     """Load images
 
+    If cache is True (default False), the MYSTIC output files are read
+    from binary cache files if available, else the cache files are
+    written (see Image.ReadMYSTICradspcfile).
+
+    The background images (A0, B0) do not depend on the timestep, they
+    can be read once with read_MYSTIC_background and passed as background
+    (ghosts are still removed for the current timestep).
     """
 
     uvinp = 'uvspecCamW{:s}{:s}{:s}{:s}.inp'.format(wavelengthA,loc,timestartstr,experimenttype)
@@ -379,7 +431,8 @@ def load_MYSTIC_image(filebase, wavelengthA,loc,timestartstr,experimenttype,
     ImgAM = Image.Image()
     ImgAM.GetUVSPECImageInputVals(uvspecinputfile)
     ImgAM.ReadMYSTICradspcfile(uvspecoutputfile, flip_y=flip_y, Filter=Filter,
-                               RemoveGhosts=True, AddRows=AddRows, timestart=timestartstr)
+                               RemoveGhosts=True, AddRows=AddRows, timestart=timestartstr,
+                               cache=cache)
     if print_MYSTIC_statistics:
         ImgAM.MYSTIC_statistics(verbose=True)
 
@@ -396,7 +449,8 @@ def load_MYSTIC_image(filebase, wavelengthA,loc,timestartstr,experimenttype,
     uvspecoutputfileBM=uvspecoutputfile.replace(str(wavelengthA),str(wavelengthB))
     ImgBM.GetUVSPECImageInputVals(uvspecinputfileBM)
     ImgBM.ReadMYSTICradspcfile(uvspecoutputfileBM, flip_y=flip_y, Filter=Filter,
-                               RemoveGhosts=True, AddRows=AddRows, timestart=timestartstr)
+                               RemoveGhosts=True, AddRows=AddRows, timestart=timestartstr,
+                               cache=cache)
     if print_MYSTIC_statistics:
         ImgBM.MYSTIC_statistics(verbose=True)
     MYSTIC_BM = Img(start_acq = start_acq)
@@ -406,17 +460,14 @@ def load_MYSTIC_image(filebase, wavelengthA,loc,timestartstr,experimenttype,
     MYSTIC_BM.meta["pix_width"]=ImgBM.rad.shape[1]
 
     # Background files
-    uvspecinputfileA0 = filebaseBG+uvinp
-    uvspecoutputfileA0 = filebaseBG+uvout
-    uvspecinputfileA0=uvspecinputfileA0.replace(loc+timestartstr+experimenttype,loc+timestampBG+experimenttypeBG)
-    uvspecoutputfileA0=uvspecinputfileA0.replace('.inp','.out')
-    if verbose:
-        print "uvspecinputfileA0", uvspecinputfileA0
-        print "uvspecoutputfileA0", uvspecoutputfileA0
-    ImgA0= Image.Image()
-    ImgA0.GetUVSPECImageInputVals(uvspecinputfileA0)
-    ImgA0.ReadMYSTICradspcfile(uvspecoutputfileA0, flip_y=flip_y, Filter=Filter,
-                               RemoveGhosts=True, AddRows=AddRows, timestart=timestartstr)
+    if background is None:
+        background = read_MYSTIC_background(filebase, wavelengthA, loc, timestartstr,
+                                            experimenttype, wavelengthB, filebaseBG,
+                                            timestampBG, experimenttypeBG,
+                                            flip_y=flip_y, Filter=Filter,
+                                            verbose=verbose, cache=cache)
+    ImgA0 = background[0].PostprocessedCopy(RemoveGhosts=True, AddRows=AddRows,
+                                            timestart=timestartstr)
     if print_MYSTIC_statistics:
         ImgA0.MYSTIC_statistics(verbose=True)
     MYSTIC_A0 = Img(start_acq = start_acq)
@@ -426,16 +477,8 @@ def load_MYSTIC_image(filebase, wavelengthA,loc,timestartstr,experimenttype,
     MYSTIC_A0.meta["phi1"]=ImgA0.phi1
     MYSTIC_A0.meta["phi2"]=ImgA0.phi2
 
-    ImgB0= Image.Image()
-    uvspecinputfileB0 = filebaseBG+uvinp
-    uvspecoutputfileB0 = filebaseBG+uvout
-    uvspecinputfileB0=uvspecinputfileB0.replace(loc+timestartstr+experimenttype,loc+timestampBG+experimenttypeBG)
-    uvspecinputfileB0=uvspecinputfileB0.replace(str(wavelengthA),str(wavelengthB))
-    uvspecoutputfileB0=uvspecinputfileB0.replace('.inp','.out')
-    uvspecoutputfileB0=uvspecoutputfileB0.replace(str(wavelengthA),str(wavelengthB))
-    ImgB0.GetUVSPECImageInputVals(uvspecinputfileB0)
-    ImgB0.ReadMYSTICradspcfile(uvspecoutputfileB0, flip_y=flip_y, Filter=Filter,
-                               RemoveGhosts=True, AddRows=AddRows, timestart=timestartstr)
+    ImgB0 = background[1].PostprocessedCopy(RemoveGhosts=True, AddRows=AddRows,
+                                            timestart=timestartstr)
     if print_MYSTIC_statistics:
         ImgB0.MYSTIC_statistics(verbose=True)
     MYSTIC_B0 = Img(start_acq = start_acq)
@@ -447,13 +490,77 @@ def load_MYSTIC_image(filebase, wavelengthA,loc,timestartstr,experimenttype,
     return MYSTIC_AM, MYSTIC_A0, MYSTIC_BM, MYSTIC_B0
 
 
+# Background images of worker processes and peak memory at start of
+# worker (see load_MYSTIC_images)
+_worker_background = None
+_worker_maxrss0 = 0.0
+
+def _maxrss_mb():
+    """Peak resident memory of process in MB (0 if not available)"""
+    if not resource_available:
+        return 0.0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': # bytes on Mac OS, kB on Linux
+        return maxrss / 1024.0**2
+    return maxrss / 1024.0
+
+def _init_worker(background):
+    global _worker_background, _worker_maxrss0
+    _worker_background = background
+    _worker_maxrss0 = _maxrss_mb()
+
+def _process_MYSTIC_timestep(args):
+    """Load images of one timestep and compute thresholded tau image"""
+    timestamp, loadargs, loadkwargs = args
+    timestampstr   = '{:0003d}'.format(int(timestamp))
+    filebase, wavelengthA, loc, experimenttype, wavelengthB, filebaseBG, \
+        timestampBG, experimenttypeBG = loadargs
+
+    MYSTIC_AM, MYSTIC_A0, MYSTIC_BM, MYSTIC_B0 = load_MYSTIC_image(filebase, wavelengthA,
+                                                                   loc, timestampstr, experimenttype,
+                                                                   wavelengthB, filebaseBG,
+                                                                   timestampBG, experimenttypeBG,
+                                                                   background=_worker_background,
+                                                                   **loadkwargs)
+#                                                                        timestampBG, experimenttypeBG, start_acq=times[k])
+    tau_A = MYSTIC_AM.to_tau(MYSTIC_A0) # Note that Jonas definition of tau differs
+                                        # with a minus sign from Lubcke et al. 2013 definition.
+    tau_B = MYSTIC_BM.to_tau(MYSTIC_B0)
+    tau_A.img = tau_A.img-tau_B.img
+    # Zero all values below threshold
+    tau_A.threshold=0.03 #0.00000001 #
+    tau_A.set_val_below_thresh(val=0, threshold=tau_A.threshold)
+    tau_A.statistics()
+    return tau_A
+
+def _process_MYSTIC_timestep_measured(args):
+    """Same as _process_MYSTIC_timestep, also returns increase of peak
+    memory of worker process (in MB) since start of worker"""
+    tau_A = _process_MYSTIC_timestep(args)
+    return tau_A, _maxrss_mb() - _worker_maxrss0
+
 def load_MYSTIC_images(filebase, wavelengthA,
                        loc, timestart, timeend, timestep, experimenttype,
                        wavelengthB, filebaseBG,
                        timestampBG, experimenttypeBG, flip_y=False, Filter=None,
-                       AddRows=False):
+                       AddRows=False, n_workers=1, max_memory_mb=None,
+                       cache=False):
+    """Load images of all timesteps and compute thresholded tau images
+
+    The background images (A0, B0) are read once and used for all
+    timesteps. If n_workers > 1, timesteps are processed concurrently by a
+    pool of worker processes. If max_memory_mb is set, the first timestep
+    is processed by a single worker to measure the peak memory a worker
+    needs per timestep (requires module resource, i.e. Unix), and the
+    number of workers is reduced such that all workers together stay
+    below max_memory_mb. A warning is printed if a worker exceeds its
+    share of max_memory_mb later on. For cache see load_MYSTIC_image.
 
-    ImagesAA=[]
+    Returns
+    -------
+    list
+        tau images (Img) in order of timestamps
+    """
 
     if int(timestep)>0:
         timestamps = list(range(int(timestart), int(timeend)+1, int(timestep)))
@@ -462,28 +569,67 @@ def load_MYSTIC_images(filebase, wavelengthA,
     T0 = datetime.datetime(2017,1,1,0,0,0) # define arbitrary start time
     times = [T0 + datetime.timedelta(x * DT / 86400.0) for x in range(len(timestamps))]
 
-    k=0
     print "timestamps", timestamps
-    for timestamp in timestamps:
-        timestampstr   = '{:0003d}'.format(int(timestamp))
-
-        MYSTIC_AM, MYSTIC_A0, MYSTIC_BM, MYSTIC_B0 = load_MYSTIC_image(filebase, wavelengthA,
-                                                                       loc, timestampstr, experimenttype,
-                                                                       wavelengthB, filebaseBG,
-                                                                       timestampBG, experimenttypeBG,
-                                                                       flip_y=flip_y, Filter=Filter,
-                                                                       AddRows=AddRows)
-#                                                                        timestampBG, experimenttypeBG, start_acq=times[k])
-        tau_A = MYSTIC_AM.to_tau(MYSTIC_A0) # Note that Jonas definition of tau differs
-                                            # with a minus sign from Lubcke et al. 2013 definition.
-        tau_B = MYSTIC_BM.to_tau(MYSTIC_B0)
-        tau_A.img = tau_A.img-tau_B.img
-        # Zero all values below threshold
-        tau_A.threshold=0.03 #0.00000001 #
-        tau_A.set_val_below_thresh(val=0, threshold=tau_A.threshold)
-        tau_A.statistics()
-        ImagesAA.append(tau_A)
-        k=k+1
+    if len(timestamps) == 0:
+        return []
+    background = read_MYSTIC_background(filebase, wavelengthA, loc,
+                                        '{:0003d}'.format(int(timestamps[0])),
+                                        experimenttype, wavelengthB, filebaseBG,
+                                        timestampBG, experimenttypeBG,
+                                        flip_y=flip_y, Filter=Filter,
+                                        cache=cache)
+    loadargs = (filebase, wavelengthA, loc, experimenttype, wavelengthB,
+                filebaseBG, timestampBG, experimenttypeBG)
+    loadkwargs = dict(flip_y=flip_y, Filter=Filter, AddRows=AddRows,
+                      cache=cache)
+    tasks = [(timestamp, loadargs, loadkwargs) for timestamp in timestamps]
+
+    n_workers = min(n_workers, len(tasks))
+    if n_workers <= 1:
+        _init_worker(background)
+        try:
+            ImagesAA = [_process_MYSTIC_timestep(task) for task in tasks]
+        finally:
+            _init_worker(None)
+        return ImagesAA
+
+    results = []
+    if max_memory_mb is not None:
+        if not resource_available:
+            print "Module resource not available, max_memory_mb is ignored"
+        else:
+            # measure peak memory of one worker for first timestep
+            pool = multiprocessing.Pool(1, initializer=_init_worker,
+                                        initargs=(background,))
+            try:
+                results.append(pool.apply(_process_MYSTIC_timestep_measured,
+                                          (tasks[0],)))
+            finally:
+                pool.close()
+                pool.join()
+            mem_timestep = max(results[0][1], 1.0)
+            n_workers = min(n_workers, max(1, int(max_memory_mb // mem_timestep)))
+            print "Peak memory per worker: {:.1f} MB, using {:d} workers".format(
+                mem_timestep, n_workers)
+
+    todo = tasks[len(results):]
+    if todo:
+        pool = multiprocessing.Pool(min(n_workers, len(todo)),
+                                    initializer=_init_worker,
+                                    initargs=(background,))
+        try:
+            # imap returns results in order of tasks
+            results.extend(pool.imap(_process_MYSTIC_timestep_measured, todo))
+        finally:
+            pool.close()
+            pool.join()
+
+    ImagesAA = [tau for tau, mem in results]
+    if max_memory_mb is not None and resource_available:
+        mem_peak = max(mem for tau, mem in results)
+        if mem_peak*n_workers > max_memory_mb:
+            print ("WARNING: peak memory per worker ({:.1f} MB) exceeded "
+                   "max_memory_mb/n_workers".format(mem_peak))
 
     return ImagesAA
 
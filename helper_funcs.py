@@ -2,20 +2,64 @@
 import pandas as pd
 import numpy as np
 import os
+import re
+import json
+import hashlib
 import xlrd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
+from functools import lru_cache
 import matplotlib.cm as colormaps
 import matplotlib.colors as colors
 from collections import OrderedDict as od
+from glob import glob
 from configparser import ConfigParser
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 from seaborn import heatmap
+try:
+    import pyarrow
+    import pyarrow.parquet
+    import pyarrow.dataset
+    pyarrow_available = True
+except ImportError:
+    pyarrow_available = False
+
+#: variables that are not separated from the first value by a whitespace in
+#: the diagnostics tables (e.g. FSNTOA_CERES-EBAF239.677)
+PROBLEM_VARS = ["FSNTOAC_CERES-EBAF", "FSNTOA_CERES-EBAF"]
+#: variables for which no observations exist (Obs is 0 and Bias = Model)
+OBS_ZERO_VAL = ["RESTOM", "RESSURF"]
+#: column names of dataframes returned by :func:`read_file_custom`
+DATA_HEADER = ["Run", "Years", "Variable", "Description", "Flag", 
+               "Model", "Obs", "Bias", "RMSE"]
+#: columns of :attr:`DATA_HEADER` that are used as MultiIndex
+INDEX_COLS = ["Run", "Years", "Variable", "Description"]
+
+# one data line of a diagnostics table: variable name (problem variables may
+# be glued to the first value) followed by exactly 4 values
+_DATA_LINE = re.compile(r"^[ \t]*(?:({})[ \t]*|(\S+)[ \t]+)"
+                        r"(\S+[ \t]+\S+[ \t]+\S+[ \t]+\S+)[ \t\r]*$".format(
+                            "|".join(re.escape(x) for x in PROBLEM_VARS)), 
+                        re.MULTILINE)
+#: version of the output of :func:`read_file_custom`. Increase, whenever the 
+#: parser output changes, to invalidate tables cached by :class:`TableCache`
+PARSER_VERSION = 1
+
+_TEST_CASE = re.compile(r"TEST CASE:(.*)")
+_CONTROL_CASE = re.compile(r"CONTROL CASE:(.*)")
+
 ### Pandas Dataframe manipulation
    
 def calc_and_add_relerror(df, colname, unstack_indices):
     """Calculate RMSE relative error in a rowwise manner
     
-    This algorithm extracts the data column of a Dataframe that migh
+    For each value of the input column, the relative deviation from the 
+    mean of all values that share the same index values in all levels 
+    except ``unstack_indices`` is computed. This corresponds to unstacking
+    ``unstack_indices`` into columns and computing the relative error 
+    with respect to the row mean, but is done using a groupby transform, 
+    without reshaping the Dataframe.
     
     Parameters
     -----------
@@ -34,16 +78,55 @@ def calc_and_add_relerror(df, colname, unstack_indices):
         modified dataframe with addional column specifying the relative error
         of the input column name
     """
+    return calc_and_add_relerrors(df, [colname], unstack_indices)
+
+def calc_and_add_relerrors(df, colnames, unstack_indices):
+    """Calculate relative errors of multiple columns in one pass
+    
+    Batch version of :func:`calc_and_add_relerror`, that adds a column 
+    <colname>_ERR for each input column name (e.g. RMSE, Bias), using one 
+    grouping of the index.
     
+    Parameters
+    -----------
+    df : DataFrame
+        Index or Multiindex Dataframe
+    colnames : list
+        Names of columns for which relative errors are computed
+    unstack_indices : list
+        list specifying levels of MuliIndex along which the mean values for 
+        the relative errors are computed (cf. :func:`calc_and_add_relerror`)
+    
+    Returns
+    -------
+    DataFrame
+        modified dataframe with addional columns specifying the relative 
+        errors of the input columns
+    """
     if isinstance(df.columns, pd.MultiIndex):
         raise AttributeError("Need multiindex dataframe that has not been "
                              "stacked")
-    df_ana = df.unstack(unstack_indices)
-    vals = df_ana[colname]
-    vals_mean = vals.mean(axis=1, skipna=True)
-    vals_err_rel = vals.subtract(vals_mean, axis=0).div(vals_mean, axis=0)
-    stacked = vals_err_rel.stack(unstack_indices).reorder_levels(order=df.index.names)
-    df["{}_ERR".format(colname)] = stacked
+    if isinstance(colnames, str):
+        colnames = [colnames]
+    if isinstance(unstack_indices, (str, int)):
+        unstack_indices = [unstack_indices]
+    names = list(df.index.names)
+    unstacked = [names[x] if isinstance(x, int) else x 
+                 for x in unstack_indices]
+    for name in unstacked:
+        if not name in names:
+            raise KeyError("No such index level: {}".format(name))
+    group_levels = [name for name in names if not name in unstacked]
+    
+    vals = df[list(colnames)]
+    if group_levels:
+        vals_mean = vals.groupby(level=group_levels, 
+                                 sort=False).transform("mean")
+    else:
+        vals_mean = vals.mean()
+    vals_err_rel = (vals - vals_mean) / vals_mean
+    for colname in colnames:
+        df["{}_ERR".format(colname)] = vals_err_rel[colname].values
     
     return df
 
@@ -63,6 +146,32 @@ def stack_dataframe(df, level_names):
     order_orig = tuple(np.roll(stacked.index.names, len(level_names)))
     return stacked.reorder_levels(order=order_orig)
 
+def _crop_levels_values(names, values, levels=None):
+    """Convert input of :func:`crop_selection_dataframe` into lists
+    
+    Returns
+    -------
+    tuple
+        list of level numbers and list of corresponding values
+    """
+    if levels is None:
+        print("Input levels not defined for MultiIndex, assuming 0")
+        levels = [0]
+    elif isinstance(levels, str): #not a list
+        levels, values = [levels], [values]
+    else: #not a string and not None, so either a list or a number (can be checked using iter())
+        try:
+            iter(levels)
+        except:
+            #input is single level / value pair
+            levels, values = [levels], [values]        
+    
+    if isinstance(levels[0], str):
+        level_nums = [names.index(x) for x in levels]
+    else:
+        level_nums = levels
+    return (list(level_nums), values)
+    
 def crop_selection_dataframe(df, values, levels=None):
     """Crop a selection from a MultiIndex Dataframe
     
@@ -70,7 +179,10 @@ def crop_selection_dataframe(df, values, levels=None):
     ----------
     df : DataFrame
         
-    
+    Note
+    ----
+    If multiple selections are cropped from the same Dataframe, use 
+    :class:`SelectionIndex`, which is much faster.
     """
     names = df.index.names
     num_indices = len(names)
@@ -79,24 +191,7 @@ def crop_selection_dataframe(df, values, levels=None):
         return df.loc[values, :]
     else:
         # Multiindex
-        if levels is None:
-            print("Input levels not defined for MultiIndex, assuming 0")
-            levels = [0]
-        elif isinstance(levels, str): #not a list
-            levels, values = [levels], [values]
-        else: #not a string and not None, so either a list or a number (can be checked using iter())
-            try:
-                iter(levels)
-            except:
-                #input is single level / value pair
-                levels, values = [levels], [values]        
-        
-        
-        
-        if isinstance(levels[0], str):
-            level_nums = [names.index(x) for x in levels]
-        else:
-            level_nums = levels
+        level_nums, values = _crop_levels_values(names, values, levels)
         
         indexer = []
         for idx in range(len(names)):
@@ -108,24 +203,224 @@ def crop_selection_dataframe(df, values, levels=None):
         
         return df.loc[tuple(indexer), :]
            
+class SelectionIndex(object):
+    """Lookup structure for fast crops of a MultiIndex Dataframe
+    
+    Built once per Dataframe, it holds a lexsorted copy of the Dataframe and
+    for each index level a mapping of level values to row positions. Crops 
+    (same input as :func:`crop_selection_dataframe`) are then computed from
+    integer positions using :func:`DataFrame.take`, without the lexsort 
+    checks and scans of the ``.loc`` path. The result is the same as 
+    applying :func:`crop_selection_dataframe` to the sorted Dataframe, that 
+    is, rows are in sorted order, unless the input values of a cropped 
+    level are not sorted, in which case rows are ordered by the input values
+    of the cropped levels first.
+    
+    Note
+    ----
+    The lookup structure is not updated if the Dataframe is modified
+    
+    Parameters
+    ----------
+    df : DataFrame
+        Dataframe with MultiIndex
+    
+    Example
+    -------
+    >>> sel = SelectionIndex(df)
+    >>> sel.crop(["RESTOM", "TS_NCEP"], levels="Variable")
+    """
+    def __init__(self, df):
+        if not isinstance(df.index, pd.MultiIndex):
+            raise AttributeError("SelectionIndex requires a MultiIndex "
+                                 "Dataframe")
+        self.df = df
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        self.df_sorted = df
+        self.names = list(df.index.names)
+        self._codes = [np.asarray(c) for c in df.index.codes]
+        self._levels = list(df.index.levels)
+        self._positions = [None] * len(self.names)
+        self._code_maps = [None] * len(self.names)
+        
+    def positions(self, level):
+        """Mapping of values of one index level to row positions
+        
+        Parameters
+        ----------
+        level : int or str
+            index level
+        
+        Returns
+        -------
+        OrderedDict
+            level values (keys) and corresponding row positions in 
+            :attr:`df_sorted` (values)
+        """
+        if isinstance(level, str):
+            level = self.names.index(level)
+        if self._positions[level] is None:
+            codes = self._codes[level]
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], 
+                                     np.arange(len(self._levels[level]) + 1))
+            self._positions[level] = od(
+                (val, order[bounds[i]:bounds[i + 1]]) 
+                for i, val in enumerate(self._levels[level]))
+        return self._positions[level]
+        
+    def _level_codes(self, level_num, values):
+        if np.isscalar(values):
+            values = [values]
+        if self._code_maps[level_num] is None:
+            self._code_maps[level_num] = dict(
+                (val, i) for i, val in enumerate(self._levels[level_num]))
+        code_map = self._code_maps[level_num]
+        missing = [val for val in values if not val in code_map]
+        if missing:
+            raise KeyError(missing[0] if len(missing) == 1 else missing)
+        return np.array([code_map[val] for val in values], dtype=int)
+        
+    def crop_positions(self, values, levels=None):
+        """Row positions in :attr:`df_sorted` of a selection
+        
+        See :func:`crop` for input parameters
+        """
+        level_nums, values = _crop_levels_values(self.names, values, levels)
+        pos = None
+        ranks = []
+        need_sort = False
+        for level_num, vals in zip(level_nums, values):
+            codes = self._level_codes(level_num, vals)
+            need_sort = need_sort or (codes[:-1] > codes[1:]).any()
+            lut = np.full(len(self._levels[level_num]), -1, dtype=int)
+            # first occurence determines the rank of duplicate values
+            lut[codes[::-1]] = np.arange(len(codes))[::-1]
+            if pos is None:
+                posmap = self.positions(level_num)
+                pos = np.sort(np.concatenate(
+                    [posmap[self._levels[level_num][c]] for c in 
+                     np.unique(codes)]))
+            else:
+                pos = pos[lut[self._codes[level_num][pos]] >= 0]
+            ranks.append((level_num, lut))
+        if not need_sort:
+            return pos
+        # order like .loc: by rank of values in cropped levels (in level 
+        # order), then by the order of the sorted Dataframe
+        keys = [pos]
+        for level_num, lut in sorted(ranks, reverse=True):
+            keys.append(lut[self._codes[level_num][pos]])
+        return pos[np.lexsort(keys)]
+        
+    def crop(self, values, levels=None):
+        """Crop a selection
+        
+        Parameters
+        ----------
+        values 
+            value or list of values for each cropped level
+        levels : int or str or list
+            cropped level(s) (cf. :func:`crop_selection_dataframe`)
+        
+        Returns
+        -------
+        DataFrame
+            cropped Dataframe
+        """
+        return self.df_sorted.take(self.crop_positions(values, levels))
+    
+    def compare_timing(self, values, levels=None, number=10):
+        """Compare timing of :func:`crop` and :func:`crop_selection_dataframe`
+        
+        Parameters
+        ----------
+        values 
+            value or list of values for each cropped level
+        levels : int or str or list
+            cropped level(s) (cf. :func:`crop_selection_dataframe`)
+        number : int
+            number of repetitions
+        
+        Returns
+        -------
+        OrderedDict
+            mean time per crop in s for ``.loc`` path and ``take`` path and
+            speedup factor
+        """
+        from timeit import timeit
+        import warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            t_loc = timeit(lambda: crop_selection_dataframe(self.df, values, 
+                                                            levels), 
+                           number=number) / number
+        t_take = timeit(lambda: self.crop(values, levels), 
+                        number=number) / number
+        return od(loc=t_loc, take=t_take, speedup=t_loc / t_take)
+        
 def reindex_order_dataframe(df, new_order_list, level=0):
-    level_names = df.index.names
-    new_levels = []
+    """Change order of values in one index level of a MultiIndex Dataframe
+    
+    Only the codes of the index are remapped and the rows are sorted 
+    (stable) according to the new order (values of other levels remain in 
+    order of appearance). No Cartesian product of the index levels is 
+    created, i.e. combinations that do not exist in the input are not 
+    added as NaN rows.
+    
+    Parameters
+    ----------
+    df : DataFrame
+        Dataframe with MultiIndex
+    new_order_list : list
+        new order of values in index level (permutation of current values)
+    level : int or str
+        index level
+    
+    Returns
+    -------
+    DataFrame
+        reordered Dataframe
+    """
+    idx = df.index
+    level_names = idx.names
+    new_levels, new_codes, sort_keys = [], [], []
     for i, name in enumerate(level_names):
-        #current unique values of level index
-        vals = df.index.get_level_values(name).unique().values
+        lev = idx.levels[i]
+        codes = np.asarray(idx.codes[i])
+        #current unique values of level index (codes in order of appearance)
+        uniq_codes = pd.unique(codes)
+        lut = np.full(len(lev), -1, dtype=np.intp)
         if name == level or i == level:
+            vals = lev.take(uniq_codes)
             if not len(new_order_list) == len(vals):
                 raise ValueError("Mismatch in lengths of input array and "
                                  "index array.")
-            elif not all([x in vals for x in new_order_list]):
+            elif (not len(set(new_order_list)) == len(new_order_list) or
+                  not set(new_order_list) == set(vals)):
                 raise NameError("Input list is not a permutation of current "
                                 "index at level {}".format(level))
-            new_levels.append(new_order_list)
+            # input is a permutation, i.e. all codes are remapped
+            lut[lev.get_indexer(new_order_list)] = np.arange(len(vals))
+            codes = lut[codes]
+            new_levels.append(pd.Index(new_order_list, name=name))
+            sort_keys.append(codes)
         else:
-            new_levels.append(vals)
-    new_idx = pd.MultiIndex.from_product(new_levels, names=level_names)
-    return df.reindex(new_idx)
+            lut[uniq_codes] = np.arange(len(uniq_codes))
+            new_levels.append(lev)
+            sort_keys.append(lut[codes])
+        new_codes.append(codes)
+    order = np.lexsort(sort_keys[::-1])
+    if (order == np.arange(len(order))).all():
+        out = df.copy(deep=False)
+    else:
+        out = df.take(order)
+        new_codes = [codes[order] for codes in new_codes]
+    # integrity is ensured by permutation check above
+    out.index = pd.MultiIndex(levels=new_levels, codes=new_codes, 
+                              names=level_names, verify_integrity=False)
+    return out
      
 def rename_index_dataframe(df, level=0, new_names=None, prefix=None, 
                            lead_zeros=1):
@@ -153,7 +448,98 @@ def rename_index_dataframe(df, level=0, new_names=None, prefix=None,
     return df
     
     
+#: dtypes of data columns in compact memory layout (cf. 
+#: :func:`compact_dataframe`). float32 has about 7 significant digits, i.e.
+#: values of the result files (3 decimals) are exact up to about 1e4
+COMPACT_DTYPES = od([("Flag", bool),
+                     ("Model", np.float32),
+                     ("Obs", np.float32),
+                     ("Bias", np.float32),
+                     ("RMSE", np.float32)])
 
+def compact_dataframe(df, dtypes=None):
+    """Convert a merged result table into a memory efficient layout
+    
+    Compared to the default layout of :func:`read_and_merge_all`, the Flag
+    column is stored as bool and the data columns (Model, Obs, Bias, RMSE) 
+    as float32 (cf. :attr:`COMPACT_DTYPES`). The dtypes are fixed (i.e. do
+    not depend on the values), so that chunks (cf. :func:`iter_diagnostics`)
+    and blocks (cf. :class:`MergedDiagnostics`) of the same data can be 
+    concatenated without upcasting. 
+    
+    The index is not compacted: the MultiIndex (Run, Years, Variable, 
+    Description) of :func:`read_and_merge_all` is int-coded in both layouts
+    already (each level value is stored once, codes are small ints), so the
+    saving comes from the data columns only. Unused levels are removed 
+    (e.g. after selecting a subset of a table).
+    Only columns that change their dtype are converted, the Dataframe is not
+    copied as a whole and the input Dataframe is not modified.
+    
+    Parameters
+    ----------
+    df : DataFrame
+        table as returned by :func:`read_file_custom` or 
+        :func:`read_and_merge_all`
+    dtypes : dict, optional
+        dtypes of columns, if None, :attr:`COMPACT_DTYPES` is used. Columns
+        that are not specified remain unchanged
+    
+    Returns
+    -------
+    DataFrame
+        table in compact layout
+    """
+    if dtypes is None:
+        dtypes = COMPACT_DTYPES
+    convert = od((col, dtype) for col, dtype in dtypes.items() 
+                 if col in df.columns and not df[col].dtype == dtype)
+    if convert:
+        df = df.astype(convert)
+    if isinstance(df.index, pd.MultiIndex):
+        if not convert:
+            df = df.copy(deep=False)
+        df.index = df.index.remove_unused_levels()
+    return df
+
+def _finalise_dtypes(df, compact=False):
+    """Set dtypes of merged table (default or compact layout)"""
+    if compact:
+        return compact_dataframe(df)
+    return df[df.columns].astype(float)
+
+def compare_memory_layouts(file_list, var_info_dict=None, **read_settings):
+    """Compare memory usage of default and compact layout of merged table
+    
+    Parameters
+    ----------
+    file_list : list
+        list containing valid file paths
+    var_info_dict : dict
+        optinal dictionary that contains description strings for each of the 
+        variables (cf. :func:`read_and_merge_all`)
+    **read_settings
+        additional keyword args passed to :func:`read_and_merge_all`
+    
+    Returns
+    -------
+    DataFrame
+        memory usage in bytes (incl. Index and Total) of the default and 
+        compact layout and the ratio of both (the ratio of the Index is 1, 
+        cf. :func:`compact_dataframe`)
+    """
+    result = od()
+    for name, compact in (("default", False), ("compact", True)):
+        df = read_and_merge_all(file_list, var_info_dict, compact=compact,
+                                **read_settings)
+        mem = df.memory_usage(index=True, deep=True)
+        mem["Total"] = mem.sum()
+        result[name] = mem
+        result["{} dtype".format(name)] = pd.Series(
+            od([(col, str(df[col].dtype)) for col in df.columns]))
+    result = pd.DataFrame(result, index=result["default"].index)
+    result["ratio"] = result["compact"] / result["default"]
+    return result
+    
 ### I/O helpers
 def load_varconfig_ini(fpath):
     cfg = ConfigParser(allow_no_value=True)
@@ -170,8 +556,316 @@ def print_dict(dictionary):
     for k, v in dictionary.items():
         print("{}: {}".format(k, v))
       
+class TableCache(object):
+    """Persistent on-disk cache for Dataframes of parsed result files
+    
+    Entries are keyed on the absolute file path, the modification time and 
+    size of the file, the parser version (:attr:`PARSER_VERSION`) and the
+    variable info dictionary used for reading. They are stored as Parquet 
+    files (or pickle files, if pyarrow is not installed) in 
+    :attr:`cache_dir`. Entries of modified files are never accessed again 
+    and are removed eventually, since the total size of the cache directory 
+    is capped by :attr:`max_bytes` and least recently used entries are 
+    removed first (cf. :func:`evict`).
+    
+    Parameters
+    ----------
+    cache_dir : str, optional
+        cache directory (default: ~/.cache/noresm_diag_tables)
+    max_bytes : int
+        maximum total size of the cached tables in bytes
+    """
+    def __init__(self, cache_dir=None, max_bytes=500*1024**2):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".cache", 
+                                     "noresm_diag_tables")
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ext = ".parquet" if pyarrow_available else ".pkl"
+    
+    @staticmethod
+    def _hash(*items):
+        return hashlib.sha1(repr(items).encode("utf-8")).hexdigest()
+    
+    def settings_key(self, var_info_dict=None):
+        """Key of read settings that change the output of the parser"""
+        if var_info_dict:
+            var_info_dict = sorted(var_info_dict.items())
+        return self._hash(PARSER_VERSION, var_info_dict)
+    
+    def file_key(self, fpath, settings_key):
+        """Cache key of a result file
+        
+        Returns
+        -------
+        str or None
+            key of the file, None if the file does not exist
+        """
+        try:
+            st = os.stat(fpath)
+        except OSError:
+            return None
+        return self._hash(os.path.abspath(fpath), st.st_mtime_ns, 
+                          st.st_size, settings_key)
+    
+    def merged_key(self, file_keys):
+        """Cache key of a list of merged result files
+        
+        Returns None if one of the input keys is None
+        """
+        if any(key is None for key in file_keys):
+            return None
+        return self._hash("merged", *file_keys)
+        
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + self.ext)
+    
+    def load(self, key):
+        """Load cached Dataframe
+        
+        Returns
+        -------
+        DataFrame or None
+            cached table, None if it is not cached
+        """
+        if key is None:
+            return None
+        fpath = self.entry_path(key)
+        if not os.path.exists(fpath):
+            return None
+        try:
+            if pyarrow_available:
+                df = pd.read_parquet(fpath)
+            else:
+                df = pd.read_pickle(fpath)
+        except Exception:
+            # broken entry (e.g. interrupted write of other process)
+            self._remove(fpath)
+            return None
+        # the modification time of an entry is its last access time (LRU)
+        os.utime(fpath, None)
+        return df
+        
+    def load_many(self, keys):
+        """Load multiple cached Dataframes
+        
+        Equivalent to calling :func:`load` for each key, but for Parquet
+        entries, the conversion into pandas (which is slow for small tables)
+        is done only once for all entries.
+        
+        Returns
+        -------
+        list
+            list of cached tables (or None if not cached) for each key
+        """
+        paths = [None if key is None else self.entry_path(key) 
+                 for key in keys]
+        hits = [i for i, fpath in enumerate(paths) 
+                if fpath is not None and os.path.exists(fpath)]
+        if not pyarrow_available or len(hits) < 2:
+            return [self.load(key) for key in keys]
+        try:
+            tables = []
+            for num, i in enumerate(hits):
+                tab = pyarrow.parquet.read_table(paths[i])
+                tables.append(tab.append_column("_entry", pyarrow.array(
+                    np.full(tab.num_rows, num, dtype=np.int32))))
+            merged = pyarrow.concat_tables(tables).to_pandas()
+        except Exception:
+            # e.g. inconsistent schemas, load entries individually
+            return [self.load(key) for key in keys]
+        result = [None] * len(keys)
+        entry = merged.pop("_entry").values
+        bounds = np.searchsorted(entry, np.arange(len(hits) + 1))
+        for num, i in enumerate(hits):
+            result[i] = merged.iloc[bounds[num]:bounds[num + 1]]
+            os.utime(paths[i], None)
+        return result
+        
+    def save(self, key, df):
+        """Write Dataframe to cache"""
+        if key is None:
+            return
+        fpath = self.entry_path(key)
+        tmp = "{}.{}.tmp".format(fpath, os.getpid())
+        if pyarrow_available:
+            df.to_parquet(tmp)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, fpath)
+        
+    def _remove(self, fpath):
+        try:
+            os.remove(fpath)
+        except OSError:
+            pass
+        
+    def entries(self):
+        """List of (last access time, size, path) of all cache entries"""
+        result = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.ext):
+                continue
+            fpath = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(fpath)
+            except OSError:
+                continue
+            result.append((st.st_mtime, st.st_size, fpath))
+        return result
+    
+    @property
+    def size(self):
+        """Total size of cache entries in bytes"""
+        return sum(x[1] for x in self.entries())
+        
+    def evict(self):
+        """Remove least recently used entries until the cache is small enough
+        
+        Returns
+        -------
+        int
+            number of removed entries
+        """
+        entries = sorted(self.entries())
+        total = sum(x[1] for x in entries)
+        num = 0
+        for _, size, fpath in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(fpath)
+            total -= size
+            num += 1
+        return num
+    
+    def clear(self):
+        """Remove all cache entries"""
+        for _, _, fpath in self.entries():
+            self._remove(fpath)
+    
+    def __repr__(self):
+        return "TableCache({}, max_bytes={})".format(self.cache_dir, 
+                                                     self.max_bytes)
+        
+def _read_file_safe(fpath, var_info_dict=None, verbose=False, 
+                    engine="python"):
+    """Call :func:`read_file_custom` and catch any error
+    
+    Returns
+    -------
+    tuple
+        2-element tuple containing the Dataframe and None if reading was 
+        successful, else None and a string describing the error
+    """
+    try:
+        return (read_file_custom(fpath, var_info_dict, verbose=verbose, 
+                                 engine=engine), None)
+    except Exception as e:
+        return (None, "{}: {}".format(type(e).__name__, e))
+
+def _table_cache(cache):
+    """Cache used by :func:`read_files` (None, if cache is None or False)"""
+    if cache is None or cache is False:
+        return None
+    elif cache is True:
+        return TableCache()
+    elif isinstance(cache, TableCache):
+        return cache
+    raise ValueError("Invalid input for cache: {}. Use True, False, None or a "
+                     "TableCache instance".format(cache))
+    
+def read_files(file_list, var_info_dict=None, verbose=False, engine="python",
+               n_workers=1, executor="thread", cache=None):
+    """Read list of result files using :func:`read_file_custom`
+    
+    The files are read either one after another (``n_workers=1``) or in 
+    parallel using a pool of threads or processes. In either case, the 
+    order of the input list is preserved.
+    
+    Parameters
+    ----------
+    file_list : list
+        list containing valid file paths
+    var_info_dict : dict
+        optinal dictionary that contains description strings for each of the 
+        variables (cf. :func:`read_file_custom`)
+    verbose : bool
+        if True, print output, including files that could not be read 
+        (defaults to False)
+    engine : str
+        parser engine passed to :func:`read_file_custom` ("python" or "fast")
+    n_workers : int
+        number of workers used for reading. If 1, no pool is used, if None,
+        the number of CPUs is used.
+    executor : str
+        type of pool, choose from "thread" or "process"
+    cache : TableCache or bool, optional
+        if provided, tables of files that have not changed since they were 
+        cached are loaded from the cache and newly read tables are added to 
+        the cache. If True, a :class:`TableCache` with default settings is 
+        used
+    
+    Returns
+    -------
+    tuple
+        2-element tuple containing
+        
+        - list of Dataframes of all files that could be read (in input order)
+        - OrderedDict containing paths of files that could not be read (keys)
+          and corresponding error messages (values)
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if executor == "thread":
+        pool_cls = ThreadPoolExecutor
+    elif executor == "process":
+        pool_cls = ProcessPoolExecutor
+    else:
+        raise ValueError("Invalid input for executor: {}. Choose from thread "
+                         "or process".format(executor))
+    cache = _table_cache(cache)
+    file_list = list(file_list)
+    results = [None] * len(file_list)
+    keys = [None] * len(file_list)
+    if cache is not None:
+        settings = cache.settings_key(var_info_dict)
+        keys = [cache.file_key(fpath, settings) for fpath in file_list]
+        for i, df in enumerate(cache.load_many(keys)):
+            if df is not None:
+                results[i] = (df, None)
+    todo = [i for i, res in enumerate(results) if res is None]
+    
+    args = ([file_list[i] for i in todo], repeat(var_info_dict), 
+            repeat(verbose), repeat(engine))
+    if n_workers > 1 and len(todo) > 1:
+        with pool_cls(max_workers=min(n_workers, len(todo))) as pool:
+            new = list(pool.map(_read_file_safe, *args))
+    else:
+        new = list(map(_read_file_safe, *args))
+    for i, res in zip(todo, new):
+        results[i] = res
+        if cache is not None and res[1] is None:
+            cache.save(keys[i], res[0])
+    if cache is not None and todo:
+        cache.evict()
+        
+    dfs = []
+    failed = od()
+    for fpath, (df, err) in zip(file_list, results):
+        if err is None:
+            dfs.append(df)
+        else:
+            failed[fpath] = err
+            if verbose:
+                print("Failed to read file {}. Error: {}".format(fpath, err))
+    return (dfs, failed)
+   
 def read_and_merge_all(file_list, var_info_dict=None, 
-                       replace_runid_prefix=None, verbose=False):
+                       replace_runid_prefix=None, verbose=False, 
+                       engine="python", n_workers=1, executor="thread",
+                       cache=None, compact=False):
     """Read and merge list of result files into one pandas Dataframe
     
     Loops over files in input filelist and calls :func:`read_file_custom` which
@@ -203,6 +897,21 @@ def read_and_merge_all(file_list, var_info_dict=None,
                  and  "Run2" -> N1850_f19_tn14_r227_ctrl (two files)
     verbose : bool
         if True, print output (defaults to False)
+    engine : str
+        parser engine passed to :func:`read_file_custom` ("python" or "fast")
+    n_workers : int
+        number of workers used to read the files (cf. :func:`read_files`)
+    executor : str
+        type of worker pool, "thread" or "process" (cf. :func:`read_files`)
+    cache : TableCache or bool, optional
+        on-disk cache for parsed tables (cf. :class:`TableCache`). If True, 
+        a cache in the default cache directory is used. Apart from the 
+        tables of the individual files, the merged table of all input files
+        is cached, so that reopening an unchanged list of files requires 
+        only one read.
+    compact : bool
+        if True, the Dataframe is returned in compact memory layout (cf. 
+        :func:`compact_dataframe`), else, all columns are float64
         
     Returns
     -------
@@ -211,18 +920,31 @@ def read_and_merge_all(file_list, var_info_dict=None,
         files. NOTE: the returned Dataframe contains a custom attribute 
         test_case that is a mapping of run IDs in table preview and 
         corresponding test_case IDs (only relevant if input parameter 
-        replace_runid_prefix is specified)
+        replace_runid_prefix is specified) and a custom attribute 
+        read_failures, that contains the files that could not be read and
+        the corresponding error messages (cf. :func:`read_files`)
     
     """
-    dfs = []
     lead_zeros = exponent(len(file_list)) + 1
-    for fpath in file_list:
-        try:
-            dfs.append(read_file_custom(fpath, var_info_dict, 
-                                        verbose=verbose))
-        except:
-            print("Failed to read file {}".format(fpath))
-    df = pd.concat(dfs)
+    if cache is True:
+        cache = TableCache()
+    df, merged_key = None, None
+    if cache:
+        settings = cache.settings_key(var_info_dict)
+        merged_key = cache.merged_key([cache.file_key(fpath, settings) 
+                                       for fpath in file_list])
+        df = cache.load(merged_key)
+    failed = od()
+    if df is None:
+        dfs, failed = read_files(file_list, var_info_dict, verbose=verbose,
+                                 engine=engine, n_workers=n_workers, 
+                                 executor=executor, cache=cache or None)
+        if not dfs:
+            raise IOError("None of the input files could be read")
+        df = pd.concat(dfs)
+        if cache and not failed:
+            cache.save(merged_key, df)
+            cache.evict()
     if replace_runid_prefix:
         df = rename_index_dataframe(df, level=0, prefix=replace_runid_prefix,
                                     lead_zeros=lead_zeros)
@@ -230,11 +952,323 @@ def read_and_merge_all(file_list, var_info_dict=None,
         df.test_case = pd.Series()
     #df.sort_index(inplace=True)
     #df.sortlevel(inplace=True)
-    df = df[df.columns].astype(float)
+    df = _finalise_dtypes(df, compact)
+    df.read_failures = failed
     return df
 
 
-def read_file_custom(fpath, var_info_dict=None, run_id=None, verbose=False):
+def _run_id(run_ids, test_case, prefix, lead_zeros):
+    """Get run ID of test case and register new ID if it does not exist
+    
+    Same naming convention as in :func:`rename_index_dataframe`, that is,
+    the n-th test case gets run ID ``prefix + str(n).zfill(lead_zeros)``
+    
+    Parameters
+    ----------
+    run_ids : OrderedDict
+        existing mapping of test cases (keys) and run IDs (values). Is updated
+        if test case is not yet registered.
+    test_case : str
+        test case ID
+    prefix : str
+        prefix for run ID
+    lead_zeros : int
+        number of digits of run ID
+    """
+    if not test_case in run_ids:
+        num_str = str(len(run_ids) + 1).zfill(lead_zeros)
+        run_ids[test_case] = "{}{}".format(prefix, num_str)
+    return run_ids[test_case]
+
+def iter_diagnostics(file_list, chunk_runs=10, var_info_dict=None, 
+                     replace_runid_prefix=None, compact=False, 
+                     **read_settings):
+    """Read result files and yield merged chunks of a limited number of runs
+    
+    Memory efficient alternative to :func:`read_and_merge_all` for large 
+    lists of files: only ``chunk_runs`` files are held in memory at a time.
+    All chunks have the same columns and dtypes as the output of 
+    :func:`read_and_merge_all` and run IDs are consistent across chunks. 
+    Chunks can be reduced on the fly, e.g. using :class:`DiagnosticsAggregator`.
+    
+    Parameters
+    ----------
+    file_list : list
+        list containing valid file paths
+    chunk_runs : int
+        number of result files (runs) per chunk
+    var_info_dict : dict
+        optinal dictionary that contains description strings for each of the 
+        variables (cf. :func:`read_and_merge_all`)
+    replace_runid_prefix : str, optional
+        prefix for run IDs (cf. :func:`read_and_merge_all`)
+    compact : bool
+        if True, chunks are returned in compact memory layout (cf. 
+        :func:`compact_dataframe`)
+    **read_settings
+        additional keyword args passed to :func:`read_files` (e.g. engine, 
+        n_workers, executor, cache)
+    
+    Yields
+    ------
+    DataFrame
+        merged table of the next ``chunk_runs`` files. Contains custom 
+        attribute read_failures (cf. :func:`read_and_merge_all`)
+    
+    Example
+    -------
+    >>> agg = DiagnosticsAggregator(["Bias", "RMSE"])
+    >>> for chunk in iter_diagnostics(files, chunk_runs=50):
+    ...     agg.add(chunk)
+    >>> agg.result()
+    """
+    file_list = list(file_list)
+    if chunk_runs < 1:
+        raise ValueError("chunk_runs needs to be at least 1")
+    lead_zeros = exponent(max(len(file_list), 1)) + 1
+    run_ids = od()
+    # same cache instance for all chunks
+    if "cache" in read_settings:
+        read_settings["cache"] = _table_cache(read_settings["cache"])
+    for i in range(0, len(file_list), chunk_runs):
+        dfs, failed = read_files(file_list[i:i + chunk_runs], var_info_dict,
+                                 **read_settings)
+        if not dfs:
+            continue
+        df = pd.concat(dfs)
+        del dfs
+        if replace_runid_prefix:
+            mapping = od()
+            for test_case in df.index.get_level_values(0).unique():
+                mapping[test_case] = _run_id(run_ids, test_case, 
+                                             replace_runid_prefix, lead_zeros)
+            df = df.rename(index=mapping, level=0)
+        df = _finalise_dtypes(df, compact)
+        df.read_failures = failed
+        yield df
+        
+class DiagnosticsAggregator(object):
+    """Streaming reduction of merged result tables
+    
+    Accumulates count, sum, sum of squares, minimum and maximum of data 
+    columns (e.g. Bias, RMSE) per index level value (e.g. per Variable) 
+    over any number of tables (e.g. chunks from :func:`iter_diagnostics`), 
+    without keeping the tables in memory.
+    
+    Parameters
+    ----------
+    columns : list
+        data columns to be aggregated
+    level : str or int
+        index level used for grouping
+    """
+    def __init__(self, columns=["Bias", "RMSE"], level="Variable"):
+        if isinstance(columns, str):
+            columns = [columns]
+        self.columns = list(columns)
+        self.level = level
+        self._stats = None
+    
+    def add(self, df):
+        """Add table to aggregate"""
+        vals = df[self.columns]
+        grouped = vals.groupby(level=self.level, sort=False)
+        stats = pd.concat([grouped.count(), 
+                           grouped.sum(), 
+                           (vals ** 2).groupby(level=self.level, 
+                                               sort=False).sum(),
+                           grouped.min(), 
+                           grouped.max()],
+                          axis=1, keys=["count", "sum", "sumsq", "min", "max"])
+        if self._stats is None:
+            self._stats = stats
+            return
+        old = self._stats.reindex(self._stats.index.union(stats.index, 
+                                                          sort=False))
+        stats = stats.reindex(old.index)
+        for key in ["count", "sum", "sumsq"]:
+            old[key] = old[key].add(stats[key], fill_value=0)
+        old["min"] = np.fmin(old["min"], stats["min"])
+        old["max"] = np.fmax(old["max"], stats["max"])
+        self._stats = old
+    
+    def result(self):
+        """Compute aggregates
+        
+        Returns
+        -------
+        DataFrame
+            table with index level values as rows and 2-level columns 
+            (data column, statistic), statistics are count, mean, std, rms 
+            (root mean square), min and max
+        """
+        if self._stats is None:
+            raise ValueError("No data added yet")
+        s = self._stats
+        n = s["count"]
+        mean = s["sum"] / n
+        rms = np.sqrt(s["sumsq"] / n)
+        var = (s["sumsq"] - n * mean ** 2) / (n - 1)
+        std = np.sqrt(var.clip(lower=0))
+        result = pd.concat([n, mean, std, rms, s["min"], s["max"]], axis=1,
+                           keys=["count", "mean", "std", "rms", "min", "max"])
+        return result.swaplevel(axis=1)[self.columns]
+    
+class MergedDiagnostics(object):
+    """Merged table of result files that can be updated incrementally
+    
+    Does the same as :func:`read_and_merge_all` but keeps track of the files 
+    that are already merged (and their modification times and sizes). Each
+    call of :func:`refresh` only reads files that are new or were modified 
+    since the last refresh and appends (or replaces) the corresponding run
+    blocks in :attr:`df`. Blocks of files that no longer exist are removed.
+    
+    Run IDs (if ``replace_runid_prefix`` is specified) are stable across
+    refreshes: test cases keep their ID and new test cases get the next 
+    free number (cf. :func:`rename_index_dataframe`).
+    
+    Parameters
+    ----------
+    source : str or list
+        glob pattern (e.g. "data/*.webarchive") that is re-evaluated on each
+        refresh, or list of file paths
+    var_info_dict : dict
+        optinal dictionary that contains description strings for each of the 
+        variables (cf. :func:`read_and_merge_all`)
+    replace_runid_prefix : str, optional
+        prefix for run IDs (cf. :func:`read_and_merge_all`)
+    lead_zeros : int, optional
+        number of digits of run IDs. If None, it is computed from the number
+        of files at the first refresh and kept fixed afterwards.
+    compact : bool
+        if True, the merged table uses the compact memory layout (cf. 
+        :func:`compact_dataframe`)
+    **read_settings
+        additional keyword args passed to :func:`read_files` (e.g. engine, 
+        n_workers, executor, cache)
+    
+    Example
+    -------
+    >>> merged = MergedDiagnostics("data/*.webarchive", 
+                                   replace_runid_prefix="Run")
+    >>> merged.df.head()
+    >>> # some time later, when new runs have arrived
+    >>> merged.refresh()
+    """
+    def __init__(self, source, var_info_dict=None, replace_runid_prefix=None,
+                 lead_zeros=None, compact=False, **read_settings):
+        self.source = source
+        self.compact = compact
+        self.var_info_dict = var_info_dict
+        self.replace_runid_prefix = replace_runid_prefix
+        self.lead_zeros = lead_zeros
+        # same cache instance for all refreshes
+        if "cache" in read_settings:
+            read_settings["cache"] = _table_cache(read_settings["cache"])
+        self.read_settings = read_settings
+        
+        self.df = None
+        #: merged files and corresponding (mtime, size)
+        self.files = od()
+        #: (test case, years) of merged files
+        self._blocks = od()
+        #: run IDs of test cases
+        self.run_ids = od()
+        self.read_failures = od()
+        
+        self.refresh()
+    
+    @property
+    def test_case(self):
+        """Mapping of run IDs and test case IDs"""
+        return pd.Series(od((v, k) for k, v in self.run_ids.items()))
+    
+    def find_files(self):
+        """Current list of files from :attr:`source`"""
+        if isinstance(self.source, str):
+            return sorted(glob(self.source))
+        return list(self.source)
+    
+    @staticmethod
+    def _stat(fpath):
+        try:
+            st = os.stat(fpath)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    def refresh(self, file_list=None):
+        """Read new or modified files and update merged table
+        
+        Parameters
+        ----------
+        file_list : list, optional
+            files to be checked, if None, :func:`find_files` is used
+            
+        Returns
+        -------
+        OrderedDict
+            lists of added, modified and removed files
+        """
+        if file_list is None:
+            file_list = self.find_files()
+        if self.lead_zeros is None:
+            self.lead_zeros = exponent(max(len(file_list), 1)) + 1
+        stats = od((fpath, self._stat(fpath)) for fpath in file_list)
+        
+        added = [f for f in file_list if not f in self.files]
+        modified = [f for f in file_list if f in self.files and 
+                    stats[f] != self.files[f]]
+        removed = [f for f in self.files if not f in stats]
+        summary = od(added=added, modified=modified, removed=removed)
+        
+        to_read = added + modified
+        dfs, failed = [], od()
+        if to_read:
+            dfs, failed = read_files(to_read, self.var_info_dict, 
+                                     **self.read_settings)
+        for fpath in failed:
+            self.read_failures[fpath] = failed[fpath]
+        ok = [fpath for fpath in to_read if not fpath in failed]
+        
+        drop = []
+        for fpath in modified + removed:
+            if fpath in self._blocks:
+                drop.append(self._blocks.pop(fpath))
+            self.files.pop(fpath, None)
+        
+        new = []
+        for fpath, block in zip(ok, dfs):
+            test_case = block.index.get_level_values(0)[0]
+            years = block.index.get_level_values(1)[0]
+            run_id = test_case
+            if self.replace_runid_prefix:
+                run_id = _run_id(self.run_ids, test_case, 
+                                 self.replace_runid_prefix, self.lead_zeros)
+                block = block.rename(index={test_case: run_id}, level=0)
+            self._blocks[fpath] = (run_id, years)
+            self.files[fpath] = stats[fpath]
+            self.read_failures.pop(fpath, None)
+            new.append(_finalise_dtypes(block, self.compact))
+        
+        df = self.df
+        if df is not None and drop:
+            blocks = pd.MultiIndex.from_arrays([df.index.get_level_values(0),
+                                                df.index.get_level_values(1)])
+            df = df[~blocks.isin(drop)]
+        if new:
+            df = pd.concat(new if df is None else [df] + new)
+        if df is None:
+            raise IOError("None of the input files could be read")
+        self.df = df
+        return summary
+        
+    def __repr__(self):
+        return ("MergedDiagnostics({} files, {} runs)"
+                .format(len(self.files), len(self.run_ids)))
+
+def read_file_custom(fpath, var_info_dict=None, run_id=None, verbose=False,
+                     engine="python"):
     """Custom ASCII conversion method 
     
     Parameters
@@ -252,6 +1286,11 @@ def read_file_custom(fpath, var_info_dict=None, run_id=None, verbose=False):
         file header is used for the index.
     verbose : bool
         if True, print output (defaults to False)
+    engine : str
+        parser engine, choose from "python" (default, line by line) or 
+        "fast" (single pass regex tokenizer over the data block, see 
+        :func:`_read_file_custom_fast`). Both engines return identical
+        Dataframes.
         
     Returns
     -------
@@ -262,8 +1301,22 @@ def read_file_custom(fpath, var_info_dict=None, run_id=None, verbose=False):
         relevant if custom ID for run is specified using input parameter 
         `run_id`)
     """
+    if engine == "fast":
+        return _read_file_custom_fast(fpath, var_info_dict, run_id, verbose)
+    elif engine != "python":
+        raise ValueError("Invalid input for engine: {}. Choose from python "
+                         "or fast".format(engine))
+    return _read_file_custom_python(fpath, var_info_dict, run_id, verbose)
+
+def _iter_lines(fpath):
+    """Iterate over lines of a file without reading the whole file"""
     with open(fpath, encoding="latin-1") as f:
-        lines = f.read().splitlines()
+        for line in f:
+            yield line.rstrip("\r\n")
+
+def _read_file_custom_python(fpath, var_info_dict=None, run_id=None, 
+                             verbose=False):
+    """Line by line parser engine of :func:`read_file_custom`"""
     test_case = ''
     control_case = ''
     
@@ -272,9 +1325,9 @@ def read_file_custom(fpath, var_info_dict=None, run_id=None, verbose=False):
     data = []
 
     in_data = False
-    problem_vars = ["FSNTOAC_CERES-EBAF","FSNTOA_CERES-EBAF"]
-    obs_zero_val = ["RESTOM", "RESSURF"]
-    for line in lines:
+    problem_vars = PROBLEM_VARS
+    obs_zero_val = OBS_ZERO_VAL
+    for line in _iter_lines(fpath):
         line.strip()
         
         if "TEST CASE:" in line:
@@ -283,8 +1336,7 @@ def read_file_custom(fpath, var_info_dict=None, run_id=None, verbose=False):
             if not run_id:
                 run_id = test_case
             years = spl[1].split(")")[0]
-            header = ["Run", "Years", "Variable", "Description", "Flag",
-                      "Model", "Obs", "Bias", "RMSE"]
+            header = DATA_HEADER
         elif "CONTROL CASE:" in line:
             control_case = line.split("CONTROL CASE:")[1].strip()
         elif "Variable" in line:
@@ -306,16 +1358,6 @@ def read_file_custom(fpath, var_info_dict=None, run_id=None, verbose=False):
                 _var = spl.pop(0)
             if len(spl) == 4:
                 line_data.extend([run_id, years, _var])
-                try:
-                    var_info = var_info_dict[_var]
-                    if not var_info:
-                        raise ValueError("No description available for "
-                                         "variable {}".format(_var))
-                    flag = True
-                except:
-                    var_info = ""
-                    flag = False
-                line_data.extend([var_info, flag])
                 #Variable is RESTOM or RESSURF
                 if _var in obs_zero_val:
                     val = float(spl[0])
@@ -332,9 +1374,83 @@ def read_file_custom(fpath, var_info_dict=None, run_id=None, verbose=False):
             if verbose:
                 print("Ignoring line: {}".format(line))
                 #variables.append(_var)
-    df = pd.DataFrame(data, columns=header)
-    df.set_index(["Run", "Years", "Variable", "Description"], 
-                 inplace=True)
+    df = pd.DataFrame(data, columns=[x for x in header if not x in 
+                                     ("Description", "Flag")])
+    # descriptions and flags are assigned for the whole Variable column
+    descs, flags = _map_var_info(var_info_dict, df["Variable"].values)
+    df.insert(3, "Description", descs)
+    df.insert(4, "Flag", flags)
+    df.set_index(INDEX_COLS, inplace=True)
+    df.test_case = test_case
+    if verbose:
+        print("Test case: {}".format(test_case))
+        print("Control case: {}".format(control_case))
+    return df
+
+def _read_file_custom_fast(fpath, var_info_dict=None, run_id=None, 
+                           verbose=False):
+    """Single pass parser engine of :func:`read_file_custom`
+    
+    Locates the header block (TEST CASE, CONTROL CASE, Variable) once and 
+    then tokenizes the whole data block using one regular expression. The 
+    conversion of values (e.g. -999 to NaN) is done on the resulting numpy 
+    array rather than for each line. Lines that do not contain a variable 
+    name followed by exactly 4 values are ignored.
+    """
+    with open(fpath, encoding="latin-1") as f:
+        buf = f.read()
+    
+    if not var_info_dict:
+        var_info_dict = {}
+    
+    test_cases = _TEST_CASE.findall(buf)
+    if not test_cases:
+        raise IOError("No TEST CASE specified in file {}".format(fpath))
+    spl = test_cases[-1].strip().split("(yrs ")
+    test_case = spl[0].strip()
+    if not run_id:
+        run_id = test_case
+    years = spl[1].split(")")[0]
+    
+    control_cases = _CONTROL_CASE.findall(buf)
+    control_case = control_cases[-1].strip() if control_cases else ''
+    
+    start = buf.find("Variable")
+    if start < 0:
+        rows = []
+    else:
+        start = buf.find("\n", start) + 1
+        rows = _DATA_LINE.findall(buf, start) if start > 0 else []
+    
+    arr = np.array(rows, dtype=object).reshape(len(rows), 3)
+    variables = np.where(arr[:, 0] != "", arr[:, 0], arr[:, 1])
+    raw = np.array(" ".join(arr[:, 2]).split(), dtype=float).reshape(-1, 4)
+    vals = np.where(raw == -999, np.nan, raw)
+    zero_obs = np.isin(variables, OBS_ZERO_VAL)
+    vals[zero_obs, 0] = raw[zero_obs, 0]
+    vals[zero_obs, 1] = 0
+    vals[zero_obs, 2] = raw[zero_obs, 0]
+    vals[zero_obs, 3] = np.nan
+    
+    var_codes, var_levels = pd.factorize(variables, sort=True)
+    descs, flags = _map_var_info(var_info_dict, var_levels)
+    flags, descs = flags[var_codes], descs[var_codes]
+    desc_codes, desc_levels = pd.factorize(descs, sort=True)
+    
+    # the MultiIndex is built from the codes directly (much faster than 
+    # set_index for small tables)
+    num = len(variables)
+    const_codes = np.zeros(num, dtype=int)
+    index = pd.MultiIndex(levels=[[run_id], [years], list(var_levels), 
+                                  list(desc_levels)],
+                          codes=[const_codes, const_codes, var_codes, 
+                                 desc_codes],
+                          names=INDEX_COLS)
+    data = od()
+    data["Flag"] = flags
+    for i, col in enumerate(DATA_HEADER[5:]):
+        data[col] = vals[:, i]
+    df = pd.DataFrame(data, index=index, columns=DATA_HEADER[4:])
     df.test_case = test_case
     if verbose:
         print("Test case: {}".format(test_case))
@@ -421,6 +1537,360 @@ def load_varinfo(try_path, catch_excel_michael=None):
         save_varinfo_dict_csv(var_info_dict, try_path)
         return var_info_dict
     return load_varinfo_dict_csv(try_path)
+
+class VariableRegistry(object):
+    """Compiled lookup table of variable descriptions, flags and groups
+    
+    Combines the information of the variable info csv file (cf. 
+    :func:`load_varinfo_dict_csv`) and the variable group config file (cf. 
+    :func:`load_varconfig_ini`). The text files are parsed only once, the 
+    result is stored in a binary sidecar file (numpy .npz) in the user cache 
+    directory (:attr:`CACHE_DIR`, nothing is written next to the text 
+    files), which is used as long as modification time and size of the text 
+    files do not change. If the sidecar file cannot be written (e.g. no 
+    write access), the text files are parsed again next session. Nothing is 
+    read before the registry is used.
+    
+    The registry can be used like the variable info dictionary (e.g. as 
+    input ``var_info_dict`` of :func:`read_file_custom`), but provides 
+    vectorised mapping of variable names to descriptions and flags 
+    (cf. :func:`map_variables`).
+    
+    Note
+    ----
+    Use :func:`shared` to reuse registries within one session.
+    
+    Parameters
+    ----------
+    varinfo_csv : str, optional
+        csv file containing variable descriptions
+    varconfig_ini : str, optional
+        ini file containing variable groups
+    sidecar : str, optional
+        location of binary sidecar file (if None, a file in ``cache_dir`` is 
+        used, if False, no sidecar file is used)
+    cache_dir : str, optional
+        directory of sidecar files (if None, :attr:`CACHE_DIR` is used)
+    """
+    _instances = {}
+    SIDECAR_VERSION = 1
+    #: default directory of sidecar files
+    CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", 
+                             "noresm_diag_registry")
+    def __init__(self, varinfo_csv=None, varconfig_ini=None, sidecar=None,
+                 cache_dir=None):
+        if varinfo_csv is None and varconfig_ini is None:
+            raise ValueError("Please specify varinfo_csv and / or "
+                             "varconfig_ini")
+        self.varinfo_csv = varinfo_csv
+        self.varconfig_ini = varconfig_ini
+        if sidecar is None:
+            if cache_dir is None:
+                cache_dir = self.CACHE_DIR
+            src = varinfo_csv if varinfo_csv is not None else varconfig_ini
+            srcs = [x and os.path.abspath(x) for x in (varinfo_csv, 
+                                                        varconfig_ini)]
+            key = hashlib.sha1(repr(srcs).encode("utf-8")).hexdigest()
+            sidecar = os.path.join(cache_dir, "{}.{}.npz".format(
+                os.path.basename(src), key[:16]))
+        self.sidecar = sidecar
+        self._data = None
+        self._index = None
+    
+    @classmethod
+    def shared(cls, varinfo_csv=None, varconfig_ini=None, cache_dir=None):
+        """Get registry instance of input files (created once per session)"""
+        key = (varinfo_csv and os.path.abspath(varinfo_csv), 
+               varconfig_ini and os.path.abspath(varconfig_ini), cache_dir)
+        if not key in cls._instances:
+            cls._instances[key] = cls(varinfo_csv, varconfig_ini,
+                                      cache_dir=cache_dir)
+        return cls._instances[key]
+        
+    def _source_stats(self):
+        stats = []
+        for fpath in (self.varinfo_csv, self.varconfig_ini):
+            if fpath is None:
+                stats.extend([-1, -1])
+                continue
+            if not os.path.exists(fpath):
+                raise IOError("File not found {}".format(fpath))
+            st = os.stat(fpath)
+            stats.extend([st.st_mtime_ns, st.st_size])
+        return np.array(stats + [self.SIDECAR_VERSION], dtype=np.int64)
+    
+    def _compile(self, stats):
+        info = od()
+        if self.varinfo_csv is not None:
+            info = load_varinfo_dict_csv(self.varinfo_csv)
+        groups = od()
+        if self.varconfig_ini is not None:
+            groups = load_varconfig_ini(self.varconfig_ini)
+        group_vars = [var for gvars in groups.values() for var in gvars]
+        return dict(
+            stats=stats,
+            names=np.array(list(info.keys()), dtype=str),
+            descs=np.array(list(info.values()), dtype=str),
+            group_names=np.array(list(groups.keys()), dtype=str),
+            group_vars=np.array(group_vars, dtype=str),
+            group_bounds=np.cumsum([0] + [len(x) for x in groups.values()]))
+        
+    def _load(self):
+        stats = self._source_stats()
+        if self._data is not None and (self._data["stats"] == stats).all():
+            return self._data
+        data = None
+        if self.sidecar and os.path.exists(self.sidecar):
+            try:
+                with np.load(self.sidecar, allow_pickle=False) as npz:
+                    if (npz["stats"] == stats).all():
+                        data = dict((k, npz[k]) for k in npz.files)
+            except Exception:
+                data = None
+        if data is None:
+            data = self._compile(stats)
+            if self.sidecar:
+                tmp = "{}.{}.tmp.npz".format(self.sidecar, os.getpid())
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.sidecar)),
+                                exist_ok=True)
+                    np.savez(tmp, **data)
+                    os.replace(tmp, self.sidecar)
+                except OSError:
+                    # e.g. no write access, compile again next time
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+        data["flags"] = np.char.str_len(data["descs"]) > 0
+        self._data = data
+        self._index = pd.Index(data["names"].astype(object))
+        return data
+    
+    @property
+    def variables(self):
+        """Array of variable names"""
+        return self._load()["names"]
+    
+    @property
+    def groups(self):
+        """Variable groups (OrderedDict, cf. :func:`load_varconfig_ini`)"""
+        data = self._load()
+        bounds = data["group_bounds"]
+        return od((name, data["group_vars"][bounds[i]:bounds[i + 1]].tolist())
+                  for i, name in enumerate(data["group_names"].tolist()))
+        
+    def map_variables(self, variables):
+        """Map array of variable names to descriptions and flags
+        
+        Parameters
+        ----------
+        variables : array-like
+            variable names (e.g. Variable column or index level)
+        
+        Returns
+        -------
+        tuple
+            2-element tuple containing object array of descriptions (empty
+            string if not available) and bool array of flags (True if a
+            description is available)
+        """
+        data = self._load()
+        idx = self._index.get_indexer(np.asarray(variables, dtype=object))
+        found = idx >= 0
+        descs = np.full(len(idx), "", dtype=object)
+        descs[found] = data["descs"][idx[found]]
+        flags = np.zeros(len(idx), dtype=bool)
+        flags[found] = data["flags"][idx[found]]
+        return (descs, flags)
+    
+    def as_dict(self):
+        """Variable descriptions as OrderedDict"""
+        data = self._load()
+        return od(zip(data["names"].tolist(), data["descs"].tolist()))
+    
+    def items(self):
+        return self.as_dict().items()
+    
+    def keys(self):
+        return self.variables.tolist()
+    
+    def get(self, var, default=None):
+        self._load()
+        idx = self._index.get_indexer([var])[0]
+        return default if idx < 0 else str(self._data["descs"][idx])
+    
+    def __getitem__(self, var):
+        val = self.get(var)
+        if val is None:
+            raise KeyError(var)
+        return val
+    
+    def __contains__(self, var):
+        return self.get(var) is not None
+    
+    def __len__(self):
+        return len(self.variables)
+    
+    def __repr__(self):
+        return "VariableRegistry({}, {})".format(self.varinfo_csv,
+                                                 self.varconfig_ini)
+
+def _map_var_info(var_info_dict, variables):
+    """Map variable names to descriptions and flags (used by parsers)
+    
+    Parameters
+    ----------
+    var_info_dict : dict or VariableRegistry
+        variable descriptions
+    variables : ndarray
+        variable names
+    
+    Returns
+    -------
+    tuple
+        object array of descriptions and bool array of flags 
+        (cf. :func:`VariableRegistry.map_variables`)
+    """
+    if isinstance(var_info_dict, VariableRegistry):
+        return var_info_dict.map_variables(variables)
+    # variable info is looked up once per unique variable
+    var_codes, var_levels = pd.factorize(np.asarray(variables, dtype=object))
+    info = [var_info_dict.get(var) if var_info_dict else None 
+            for var in var_levels]
+    flags = np.array([bool(x) for x in info], dtype=bool)[var_codes]
+    descs = np.array([x if x else "" for x in info], dtype=object)[var_codes]
+    return (descs, flags)
+
+def _columnar_partitioning(partition_cols):
+    schema = pyarrow.schema([(col, pyarrow.string()) 
+                             for col in partition_cols])
+    return pyarrow.dataset.partitioning(schema, flavor="hive")
+    
+def save_columnar(df, out_dir, partition_cols=["Run", "Years"], 
+                  row_group_size=16):
+    """Write merged result table into partitioned Parquet dataset
+    
+    The table (e.g. output of :func:`read_and_merge_all`) is written into
+    one directory per value of the partition columns (e.g. 
+    ``Run=Run1/Years=80-110/``). Within each file, rows are sorted by 
+    Variable and written in small row groups, so that the Variable 
+    statistics of the row groups can be used to skip data when loading
+    a selection of variables (cf. :func:`load_columnar`). Existing 
+    partitions of the same runs are overwritten, i.e. runs can be added 
+    to or updated in an existing dataset. 
+    
+    The original order of the rows within each partition is stored, so 
+    that it can be restored when loading, independent of which subset of
+    the table was written when.
+    
+    Parameters
+    ----------
+    df : DataFrame
+        result table with MultiIndex (cf. :attr:`INDEX_COLS`)
+    out_dir : str
+        output directory
+    partition_cols : list
+        index levels or columns used for partitioning
+    row_group_size : int
+        max number of rows per row group
+    
+    Returns
+    -------
+    str
+        output directory
+    """
+    if not pyarrow_available:
+        raise ImportError("Columnar export requires pyarrow")
+    index_names = [x for x in df.index.names if x is not None]
+    for col in partition_cols:
+        if not col in index_names and not col in df.columns:
+            raise KeyError("No such index level or column: {}".format(col))
+    flat = df.reset_index()
+    for col in partition_cols:
+        flat[col] = flat[col].astype(str)
+    # original row order within partition, restored when loading
+    flat["_row"] = flat.groupby(partition_cols, sort=False).cumcount()
+    if "Variable" in flat:
+        flat = flat.sort_values(partition_cols + ["Variable"], kind="stable")
+    meta = {"index_names": index_names, 
+            "columns": [str(x) for x in df.columns]}
+    table = pyarrow.Table.from_pandas(flat, preserve_index=False)
+    table = table.replace_schema_metadata(dict(
+        table.schema.metadata or {}, 
+        noresm_diag=json.dumps(meta)))
+    pyarrow.dataset.write_dataset(
+        table, out_dir, format="parquet", 
+        partitioning=_columnar_partitioning(partition_cols),
+        existing_data_behavior="delete_matching",
+        max_rows_per_group=row_group_size)
+    return out_dir
+
+def load_columnar(out_dir, variables=None, runs=None, years=None, 
+                  columns=None, partition_cols=["Run", "Years"]):
+    """Load (selection of) result table from partitioned Parquet dataset
+    
+    Filters are applied while reading the dataset: partitions are skipped 
+    based on the directory names (runs, years) and row groups based on 
+    the Variable statistics (cf. :func:`save_columnar`).
+    
+    Parameters
+    ----------
+    out_dir : str
+        directory of dataset (cf. :func:`save_columnar`)
+    variables : list, optional
+        variables to be loaded (e.g. variables of one variable group)
+    runs : list, optional
+        runs to be loaded
+    years : list, optional
+        year ranges (e.g. "80-110") to be loaded
+    columns : list, optional
+        data columns to be loaded (e.g. ["Bias", "RMSE"])
+    partition_cols : list
+        partition columns used when the dataset was written
+    
+    Returns
+    -------
+    DataFrame
+        result table with same index levels and column order as the 
+        Dataframe that was written. Rows are sorted by the partition 
+        columns (as strings), within each partition the original row 
+        order is kept
+    """
+    if not pyarrow_available:
+        raise ImportError("Columnar export requires pyarrow")
+    if not os.path.isdir(out_dir):
+        raise IOError("No such directory: {}".format(out_dir))
+    dataset = pyarrow.dataset.dataset(
+        out_dir, format="parquet", 
+        partitioning=_columnar_partitioning(partition_cols))
+    meta = json.loads(dataset.schema.metadata[b"noresm_diag"])
+    index_names = meta["index_names"]
+    
+    filt = None
+    for col, vals in zip(["Variable", "Run", "Years"], 
+                         [variables, runs, years]):
+        if vals is None:
+            continue
+        if isinstance(vals, str):
+            vals = [vals]
+        expr = pyarrow.dataset.field(col).isin(list(vals))
+        filt = expr if filt is None else filt & expr
+    if columns is None:
+        columns = meta["columns"]
+    elif isinstance(columns, str):
+        columns = [columns]
+    load_cols = [x for x in index_names if not x in columns] + list(columns)
+    load_cols += [x for x in partition_cols if not x in load_cols]
+    table = dataset.to_table(columns=load_cols + ["_row"], filter=filt)
+    df = table.to_pandas()
+    df = df.sort_values(list(partition_cols) + ["_row"], 
+                        kind="mergesort").drop(columns="_row")
+    if index_names:
+        df.set_index(index_names, inplace=True)
+    else:
+        df.reset_index(drop=True, inplace=True)
+    return df[list(columns)]
         
 ### plotting and visualisation
 def shifted_color_map(vmin, vmax, cmap = None):
@@ -443,22 +1913,42 @@ def shifted_color_map(vmin, vmax, cmap = None):
     
     :return: 
         - shifted colormap
-        
+    
+    Note
+    ----
+    Colormaps are created by :func:`_shifted_color_map_cached` (midpoint 
+    is rounded to :attr:`MIDPOINT_DECIMALS` decimals), this function
+    returns a copy of the cached colormap.
     """
+    if cmap is None or isinstance(cmap, str):
+        return _shifted_color_map_cached(_midpoint(vmin, vmax), cmap).copy()
+    return _shifted_color_map_from_cmap(_midpoint(vmin, vmax), cmap)
 
-    if cmap is None:
-        cmap = colormaps.seismic
-    elif isinstance(cmap, str):
-        cmap = colormaps.get_cmap(cmap)
+#: number of decimals of midpoint of cached shifted colormaps
+MIDPOINT_DECIMALS = 3
 
+def _midpoint(vmin, vmax):
     midpoint = 1 - abs(vmax)/(abs(vmax) + abs(vmin))
-    cdict = {
-        'red': [],
-        'green': [],
-        'blue': [],
-        'alpha': []
-    }
+    return round(float(midpoint), MIDPOINT_DECIMALS)
 
+@lru_cache(maxsize=128)
+def _shifted_color_map_cached(midpoint, cmap=None):
+    """Cached shifted colormap (do not modify, cf. :func:`shifted_color_map`)
+    
+    Parameters
+    ----------
+    midpoint : float
+        relative position of center of colormap (rounded)
+    cmap : str, optional
+        name of colormap (if None, use default cmap: seismic)
+    """
+    if cmap is None:
+        cmap = colormaps.seismic
+    else:
+        cmap = plt.get_cmap(cmap)
+    return _shifted_color_map_from_cmap(midpoint, cmap)
+    
+def _shifted_color_map_from_cmap(midpoint, cmap):
     # regular index to compute the colors
     reg_index = np.linspace(0, 1, 257)
 
@@ -467,17 +1957,17 @@ def shifted_color_map(vmin, vmax, cmap = None):
         np.linspace(0.0, midpoint, 128, endpoint=False), 
         np.linspace(midpoint, 1.0, 129, endpoint=True)
     ])
-
-    for ri, si in zip(reg_index, shift_index):
-        r, g, b, a = cmap(ri)
-
-        cdict['red'].append((si, r, r))
-        cdict['green'].append((si, g, g))
-        cdict['blue'].append((si, b, b))
-        cdict['alpha'].append((si, a, a))
+    
+    rgba = cmap(reg_index)
+    cdict = od()
+    for i, key in enumerate(['red', 'green', 'blue', 'alpha']):
+        cdict[key] = np.column_stack([shift_index, rgba[:, i], rgba[:, i]])
 
     return colors.LinearSegmentedColormap('shiftedcmap', cdict)
 
+#: hex strings of 8 bit colour values
+_HEX_VALS = np.array(["{:02x}".format(x) for x in range(256)])
+
 def _background_gradient_list(s, m, M, cmap='bwr', low=0, high=0):
     """Method that can be used to apply contidional formatting to whole list
     
@@ -486,18 +1976,26 @@ def _background_gradient_list(s, m, M, cmap='bwr', low=0, high=0):
     rng = M - m
     low = m - (rng * low)
     high = M + (rng * high)
-    cm = shifted_color_map(vmin=low, vmax=high, cmap=cmap)
+    if cmap is None or isinstance(cmap, str):
+        cm = _shifted_color_map_cached(_midpoint(low, high), cmap)
+    else:
+        cm = shifted_color_map(vmin=low, vmax=high, cmap=cmap)
     norm = colors.Normalize(low, high)
     normed = norm(s.values)
-    c = [colors.rgb2hex(x) for x in cm(normed)]
-    return ['background-color: %s' % color for color in c]
+    # same as colors.rgb2hex for each colour
+    rgb = np.round(cm(normed)[:, :3] * 255).astype(int)
+    c = _HEX_VALS[rgb[:, 0]]
+    for i in (1, 2):
+        c = np.char.add(c, _HEX_VALS[rgb[:, i]])
+    return np.char.add('background-color: #', c).tolist()
 
 
 def df_to_heatmap(df, cmap="bwr", center=0, low=0.3, high=0.3, 
                   color_rowwise=True,
                   normalise_rows=False, normalise_rows_col=None,
                   annot=True, table_name="", num_digits=2, ax=None, 
-                  figsize=(12,12), cbar=False, **kwargs):
+                  figsize=(12,12), cbar=False, backend="seaborn", 
+                  annot_max_cells=2000, max_cells=None, dpi=None, **kwargs):
     """Plot a dataframe as heatmap
     
     Parameters
@@ -541,6 +2039,19 @@ def df_to_heatmap(df, cmap="bwr", center=0, low=0.3, high=0.3,
         size of figure for plot
     cbar : bool
         if True, a colorbar is included
+    backend : str
+        "seaborn" (:func:`seaborn.heatmap`) or "imshow" (fast, table is 
+        drawn as one image, cf. :func:`_heatmap_imshow`)
+    annot_max_cells : int
+        max number of table cells for which annotations are drawn (only
+        backend "imshow")
+    max_cells : int, optional
+        if the table has more cells, it is downsampled by averaging blocks 
+        of neighbouring cells (only backend "imshow"). If None and ``dpi`` 
+        is specified, the number of pixels of the figure is used.
+    dpi : int, optional
+        resolution of the figure (only used if ``ax`` is None), e.g. low
+        values for quick previews
     
     Returns
     -------
@@ -558,9 +2069,12 @@ def df_to_heatmap(df, cmap="bwr", center=0, low=0.3, high=0.3,
                              "column data (e.g. Bias, RMSE). Please "
                              "extract column first")
         
+    if not backend in ("seaborn", "imshow"):
+        raise ValueError("Invalid backend {}, choose from seaborn or "
+                         "imshow".format(backend))
     num_fmt = ".{}f".format(num_digits)
     if ax is None:
-        fig, ax = plt.subplots(1, 1, figsize=figsize)
+        fig, ax = plt.subplots(1, 1, figsize=figsize, dpi=dpi)
     else:
         fig = ax.figure
     cbar_kws = {}
@@ -587,8 +2101,20 @@ def df_to_heatmap(df, cmap="bwr", center=0, low=0.3, high=0.3,
         annot = df.values
     vmin, vmax = df_hm.min().min() * (1-low), df_hm.max().max()*(1+high)
     #print(vmin, vmax)
-    ax = heatmap(df_hm, center=center, cmap=cmap, annot=annot, ax=ax, fmt=num_fmt,
-                 cbar=cbar, cbar_kws=cbar_kws, vmin=vmin, vmax=vmax)
+    if backend == "imshow":
+        if max_cells is None and dpi is not None:
+            max_cells = int(np.prod(fig.get_size_inches() * fig.dpi))
+        ax = _heatmap_imshow(df_hm, center=center, cmap=cmap, annot=annot, 
+                             ax=ax, fmt=num_fmt, cbar=cbar, 
+                             cbar_kws=cbar_kws, vmin=vmin, vmax=vmax,
+                             annot_max_cells=annot_max_cells, 
+                             max_cells=max_cells)
+        if ax.downsampled is not None:
+            table_name += " (downsampled {}x{})".format(*ax.downsampled)
+    else:
+        ax = heatmap(df_hm, center=center, cmap=cmap, annot=annot, ax=ax, 
+                     fmt=num_fmt, cbar=cbar, cbar_kws=cbar_kws, vmin=vmin, 
+                     vmax=vmax)
     ax.set_title(table_name, fontsize=16)
     fig.tight_layout()
     
@@ -596,8 +2122,256 @@ def df_to_heatmap(df, cmap="bwr", center=0, low=0.3, high=0.3,
         
     
         
+def _block_mean(arr, row_fac, col_fac):
+    """Average blocks of (row_fac x col_fac) cells of 2D array (NaN aware)"""
+    nrows, ncols = arr.shape
+    pad_r, pad_c = -nrows % row_fac, -ncols % col_fac
+    arr = np.pad(arr.astype(float), ((0, pad_r), (0, pad_c)), 
+                 constant_values=np.nan)
+    blocks = arr.reshape(arr.shape[0] // row_fac, row_fac, 
+                         arr.shape[1] // col_fac, col_fac)
+    num = (~np.isnan(blocks)).sum(axis=(1, 3))
+    total = np.nansum(blocks, axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(num > 0, total / num, np.nan)
+
+def _labels(index):
+    """Tick labels and axis label of index (as in :func:`seaborn.heatmap`)"""
+    if isinstance(index, pd.MultiIndex):
+        labels = ["-".join(map(str, x)) for x in index.tolist()]
+        name = "-".join(map(str, index.names))
+    else:
+        labels = [str(x) for x in index]
+        name = index.name
+    return (labels, name)
+
+def _heatmap_imshow(df, center=0, cmap="bwr", annot=True, ax=None, 
+                    fmt=".2f", cbar=False, cbar_kws=None, vmin=None, 
+                    vmax=None, annot_max_cells=2000, max_cells=None, 
+                    max_ticks=100):
+    """Draw table as one image (fast backend of :func:`df_to_heatmap`)
+    
+    Colour mapping (including ``center``), tick labels and colour of 
+    annotations are the same as in :func:`seaborn.heatmap`. Annotations are
+    only drawn if the table has at most ``annot_max_cells`` cells and is not
+    downsampled. 
+    
+    Returns
+    -------
+    axes
+        plot axes instance, attribute ``downsampled`` contains block size of
+        downsampling (rows, cols) or None
+    """
+    if ax is None:
+        ax = plt.gca()
+    vals = df.values.astype(float)
+    row_labels, row_name = _labels(df.index)
+    col_labels, col_name = _labels(df.columns)
+    if annot is True:
+        annot = vals
+    
+    downsampled = None
+    if max_cells is not None and vals.size > max_cells:
+        nrows, ncols = vals.shape
+        fac = np.sqrt(vals.size / float(max_cells))
+        row_fac = int(min(np.ceil(fac), nrows))
+        # number of columns that fit next to the (rounded up) reduced rows
+        max_cols = max_cells // -(-nrows // row_fac)
+        if max_cols == 0:
+            # few columns, reduce rows only
+            row_fac = -(-nrows // max_cells)
+            max_cols = max(1, max_cells // -(-nrows // row_fac))
+        col_fac = -(-ncols // max_cols)
+        vals = _block_mean(vals, row_fac, col_fac)
+        row_labels = row_labels[::row_fac]
+        col_labels = col_labels[::col_fac]
+        downsampled = (row_fac, col_fac)
+        annot = None
+    
+    if vmin is None:
+        vmin = np.nanmin(vals)
+    if vmax is None:
+        vmax = np.nanmax(vals)
+    cm = plt.get_cmap(cmap) if isinstance(cmap, str) else cmap
+    if center is not None:
+        # recentre colormap like seaborn
+        vrange = max(vmax - center, center - vmin)
+        normlize = colors.Normalize(center - vrange, center + vrange)
+        cmin, cmax = normlize([vmin, vmax])
+        cm = colors.ListedColormap(cm(np.linspace(cmin, cmax, 256)))
+    norm = colors.Normalize(vmin, vmax)
+    
+    nrows, ncols = vals.shape
+    img = ax.imshow(np.ma.masked_invalid(vals), cmap=cm, norm=norm, 
+                    aspect="auto", interpolation="nearest", 
+                    extent=(0, ncols, nrows, 0))
+    
+    if (annot is not None and annot is not False and 
+        vals.size <= annot_max_cells):
+        annot = np.asarray(annot)
+        rgb = cm(norm(vals))[..., :3]
+        rgb = np.where(rgb <= .03928, rgb / 12.92, 
+                       ((rgb + .055) / 1.055) ** 2.4)
+        lum = rgb.dot([.2126, .7152, .0722])
+        for (i, j), val in np.ndenumerate(vals):
+            if np.isnan(val):
+                continue
+            ax.text(j + .5, i + .5, format(annot[i, j], fmt), 
+                    ha="center", va="center", 
+                    color="k" if lum[i, j] > .408 else "w")
+    
+    row_step = int(np.ceil(nrows / float(max_ticks)))
+    col_step = int(np.ceil(ncols / float(max_ticks)))
+    ax.set_yticks(np.arange(0, nrows, row_step) + .5)
+    ax.set_yticklabels(row_labels[::row_step], rotation=0)
+    ax.set_xticks(np.arange(0, ncols, col_step) + .5)
+    ax.set_xticklabels(col_labels[::col_step], 
+                       rotation=90 if ncols > 10 else 0)
+    ax.set_ylabel(row_name if row_name is not None else "")
+    ax.set_xlabel(col_name if col_name is not None else "")
+    if cbar:
+        ax.figure.colorbar(img, ax=ax, **(cbar_kws or {}))
+    ax.downsampled = downsampled
+    return ax
+        
+def _export_filename(*parts):
+    name = "_".join(str(x) for x in parts)
+    return re.sub(r"[^\w\-.]+", "-", name)
+
+def _export_heatmap_tasks(tasks, out_dir, fmt="png", dpi=100, 
+                          row_height=0.25, **heatmap_kwargs):
+    """Render list of heatmaps (worker of :func:`export_heatmaps`)
+    
+    One figure with Agg canvas (no pyplot) is created and reused for all
+    tables.
+    
+    Returns
+    -------
+    list
+        manifest entry of each task
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    entries = []
+    for info, table in tasks:
+        entry = od(info)
+        fpath = os.path.join(out_dir, _export_filename(
+            info["column"], info["group"], info["runs"]) + "." + fmt)
+        try:
+            fig.clf()
+            width = min(24, 4 + 1.2 * table.shape[1])
+            height = min(60, 2 + row_height * table.shape[0])
+            fig.set_size_inches(width, height)
+            ax = fig.add_subplot(111)
+            df_to_heatmap(table, ax=ax, table_name=info["column"], 
+                          **heatmap_kwargs)
+            fig.savefig(fpath, dpi=dpi)
+            entry["file"] = fpath
+            entry["status"] = "ok"
+        except Exception as e:
+            entry["file"] = None
+            entry["status"] = "{}: {}".format(type(e).__name__, e)
+        entries.append(entry)
+    fig.clf()
+    return entries
+
+def export_heatmaps(df, groups, out_dir, columns=["Bias", "RMSE"], 
+                    run_subsets=None, unstack_indices=["Run", "Years"], 
+                    n_workers=1, fmt="png", dpi=100, 
+                    manifest="manifest.json", **heatmap_kwargs):
+    """Export heatmaps of all variable groups and run subsets
+    
+    For each combination of variable group, run subset and column, the
+    selection is cropped from the merged result table, unstacked and 
+    plotted using :func:`df_to_heatmap`. Figures are rendered with the 
+    non-interactive Agg backend, optionally using a process pool (each 
+    worker reuses one figure for all of its tables). A manifest (JSON) of 
+    all outputs is written into the output directory.
+    
+    Parameters
+    ----------
+    df : DataFrame
+        merged result table (cf. :func:`read_and_merge_all`)
+    groups : dict or str
+        variable groups (group name and list of variables) or path to
+        variable group config file (cf. :func:`load_varconfig_ini`)
+    out_dir : str
+        output directory
+    columns : list
+        data columns to be plotted
+    run_subsets : dict, optional
+        name and list of runs for each run subset (if None, all runs are 
+        plotted in each figure)
+    unstack_indices : list
+        index levels that are unstacked into columns of the heatmaps
+    n_workers : int
+        number of worker processes (1: render in current process)
+    fmt : str
+        file format of figures
+    dpi : int
+        resolution of figures
+    manifest : str
+        file name of manifest (None: no manifest is written)
+    **heatmap_kwargs
+        additional keyword args passed to :func:`df_to_heatmap` (e.g. 
+        backend, normalise_rows)
+    
+    Returns
+    -------
+    list
+        manifest entries (group, runs, column, shape, file, status)
+    """
+    if isinstance(groups, str):
+        groups = VariableRegistry.shared(varconfig_ini=groups).groups
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    all_runs = list(df.index.get_level_values("Run").unique())
+    if run_subsets is None:
+        run_subsets = od(all=all_runs)
+    available = set(df.index.get_level_values("Variable"))
+    sel = SelectionIndex(df)
+    
+    tasks, entries, order = [], [], []
+    for group, variables in groups.items():
+        variables = [v for v in variables if v in available]
+        for subset, runs in run_subsets.items():
+            runs = [r for r in runs if r in all_runs]
+            for column in columns:
+                info = od(group=group, runs=subset, column=column)
+                order.append((group, subset, column))
+                if not variables or not runs:
+                    info.update(shape=None, file=None, status="empty")
+                    entries.append(info)
+                    continue
+                table = sel.crop([runs, variables], ["Run", "Variable"])
+                table = table[column].unstack(unstack_indices)
+                info["shape"] = list(table.shape)
+                tasks.append((info, table))
+    
+    settings = dict(out_dir=out_dir, fmt=fmt, dpi=dpi)
+    settings.update(heatmap_kwargs)
+    if n_workers > 1 and len(tasks) > 1:
+        chunks = [tasks[i::n_workers] for i in range(n_workers)]
+        with ProcessPoolExecutor(n_workers) as ex:
+            futures = [ex.submit(_export_heatmap_tasks, chunk, **settings)
+                       for chunk in chunks if chunk]
+            for future in futures:
+                entries.extend(future.result())
+    else:
+        entries.extend(_export_heatmap_tasks(tasks, **settings))
+    order = dict((key, i) for i, key in enumerate(order))
+    entries.sort(key=lambda x: order[(x["group"], x["runs"], x["column"])])
+    
+    if manifest:
+        with open(os.path.join(out_dir, manifest), "w") as f:
+            json.dump(entries, f, indent=2)
+    return entries
+    
 def my_table_display(df, cmap="bwr", low=0.5, high=0.5, c_nans="white",
-                     num_digits=2):
+                     num_digits=2, renderer="styler", max_styler_cells=5000,
+                     **html_kwargs):
     """Custom display of table 
     
     Currently applies conditional color formatting with a shifted colormap
@@ -623,12 +2397,29 @@ def my_table_display(df, cmap="bwr", low=0.5, high=0.5, c_nans="white",
         colour of NaN values
     num_digits : int
         number of displayed digits for table values
+    renderer : str
+        "styler" (pandas Styler), "html" (:class:`HTMLTable`, much faster 
+        for large tables) or "auto" (HTMLTable if table has more than
+        ``max_styler_cells`` cells)
+    max_styler_cells : int
+        max number of cells rendered with Styler if renderer is "auto"
+    **html_kwargs
+        additional keyword args passed to :class:`HTMLTable` (e.g. 
+        page_size)
         
     Returns
     -------
-    Styler
-        pandas Styler object ready for display
+    Styler or HTMLTable
+        pandas Styler object or HTMLTable ready for display
     """
+    if renderer == "auto":
+        renderer = "html" if df.size > max_styler_cells else "styler"
+    if renderer == "html":
+        return HTMLTable(df, cmap=cmap, low=low, high=high, c_nans=c_nans,
+                         num_digits=num_digits, **html_kwargs)
+    elif renderer != "styler":
+        raise ValueError("Invalid renderer {}, choose from styler, html or "
+                         "auto".format(renderer))
     num_fmt = "{:." + str(num_digits) + "f}"
     
     styler = df.style.apply(_background_gradient_list,
@@ -640,6 +2431,226 @@ def my_table_display(df, cmap="bwr", low=0.5, high=0.5, c_nans="white",
 
     return styler
 
+class HTMLTable(object):
+    """Fast HTML display of large tables with colour coded cells
+    
+    Alternative to the pandas Styler used in :func:`my_table_display`. 
+    Colours of all cells are computed at once and mapped into a fixed 
+    number of colour buckets, each of which is one CSS class, so the HTML 
+    contains only a short class name per cell. Tables with more rows than
+    ``page_size`` are displayed page by page (cf. :func:`page_html`). The 
+    notebook display of the object itself shows page :attr:`page` only, use 
+    :func:`widget` for a display with page controls (requires ipywidgets).
+    If all values are equal, all cells get the centre colour of ``cmap``.
+    
+    Parameters
+    ----------
+    df : DataFrame
+        table to be displayed
+    cmap : str
+        string ID of a diverging colormap (center colour preferably white)
+    low : float
+        "stretch" factor for colour / range mapping for lower end of value 
+        range (cf. :func:`my_table_display`)
+    high : float
+        "stretch" factor for colour / range mapping for upper end of value 
+        range (cf. :func:`my_table_display`)
+    c_nans : str
+        colour of NaN values
+    num_digits : int
+        number of displayed digits for table values
+    num_buckets : int
+        number of colour buckets
+    page_size : int
+        max number of rows displayed at once
+    page : int
+        displayed page (first page is 0)
+    """
+    def __init__(self, df, cmap="bwr", low=0.5, high=0.5, c_nans="white",
+                 num_digits=2, num_buckets=64, page_size=500, page=0):
+        from uuid import uuid4
+        self.df = df
+        self.page_size = page_size
+        self.page = page
+        self.uid = "htmltable_" + uuid4().hex[:8]
+        vals = df.values.astype(float)
+        nans = np.isnan(vals)
+        rng = 0.0
+        if not nans.all():
+            m, M = np.nanmin(vals), np.nanmax(vals)
+            rng = M - m
+        if rng > 0:
+            low, high = m - rng * low, M + rng * high
+            cm = shifted_color_map(vmin=low, vmax=high, cmap=cmap)
+            normed = (vals - low) / (high - low)
+        else:
+            # constant (or empty) table, shifted colormap is not defined
+            cm = plt.get_cmap(cmap)
+            normed = np.full(vals.shape, 0.5)
+        centers = (np.arange(num_buckets) + 0.5) / num_buckets
+        bucket_cols = [colors.rgb2hex(x) for x in cm(centers)]
+        
+        # NaN cells are coloured with c_nans, not with a bucket colour
+        normed[nans] = 0.0
+        buckets = np.clip((normed * num_buckets).astype(int), 0, 
+                          num_buckets - 1)
+        cls = np.char.add("c", buckets.astype(str))
+        cls[nans] = "cn"
+        
+        txt = np.char.mod("%.{}f".format(num_digits), vals)
+        # one string per row containing all data cells
+        cells = np.char.add(np.char.add(np.char.add('<td class="', cls), 
+                                        '">'), 
+                            np.char.add(txt, "</td>"))
+        self._rows = ["".join(row) for row in cells.tolist()]
+        
+        css = ["#{} td.{} {{background-color: {}}}".format(self.uid, "c%d" % i,
+                                                           col)
+               for i, col in enumerate(bucket_cols)]
+        css.append("#{} td.cn {{background-color: {}}}".format(self.uid, 
+                                                               c_nans))
+        css.append("#{} td {{text-align: right}}".format(self.uid))
+        self._css = "\n".join(css)
+        
+    @property
+    def num_pages(self):
+        """Number of pages"""
+        if not self.page_size:
+            return 1
+        return max(1, -(-len(self.df) // self.page_size))
+    
+    @staticmethod
+    def _sparse_labels(labels):
+        """Blank repeated labels of MultiIndex (like pandas display)"""
+        out = [list(x) for x in labels]
+        for i in range(len(labels) - 1, 0, -1):
+            for j in range(len(labels[i])):
+                if labels[i][:j + 1] == labels[i - 1][:j + 1]:
+                    out[i][j] = ""
+        return out
+    
+    def _header_html(self):
+        from html import escape
+        cols = self.df.columns
+        idx_names = [escape(str(x)) if x is not None else "" 
+                     for x in self.df.index.names]
+        rows = []
+        if isinstance(cols, pd.MultiIndex):
+            levels = [list(x) for x in zip(*cols.tolist())]
+        else:
+            levels = [list(cols)]
+        for num, labels in enumerate(levels):
+            name = cols.names[num] if cols.names[num] is not None else ""
+            cells = ['<th colspan="{}">{}</th>'.format(len(idx_names) - 1, "")
+                     if len(idx_names) > 1 else "", 
+                     "<th>{}</th>".format(escape(str(name)))]
+            # consecutive equal labels are merged (if higher levels match)
+            i = 0
+            while i < len(labels):
+                j = i + 1
+                while (j < len(labels) and labels[j] == labels[i] and 
+                       all(lev[j] == lev[i] for lev in levels[:num])):
+                    j += 1
+                cells.append('<th colspan="{}">{}</th>'.format(
+                    j - i, escape(str(labels[i]))))
+                i = j
+            rows.append("<tr>{}</tr>".format("".join(cells)))
+        if any(idx_names):
+            rows.append("<tr>{}</tr>".format("".join(
+                "<th>{}</th>".format(x) for x in idx_names)))
+        return "<thead>{}</thead>".format("".join(rows))
+    
+    def page_html(self, page=None):
+        """HTML of one page
+        
+        Parameters
+        ----------
+        page : int, optional
+            page number (if None, use :attr:`page`)
+        
+        Returns
+        -------
+        str
+            HTML code (style and table)
+        """
+        from html import escape
+        if page is None:
+            page = self.page
+        if not 0 <= page < self.num_pages:
+            raise IndexError("Page {} out of range (0-{})".format(
+                page, self.num_pages - 1))
+        start = page * self.page_size if self.page_size else 0
+        stop = start + self.page_size if self.page_size else len(self.df)
+        stop = min(stop, len(self.df))
+        labels = self.df.index[start:stop].tolist()
+        if not isinstance(self.df.index, pd.MultiIndex):
+            labels = [(x,) for x in labels]
+        labels = self._sparse_labels(labels)
+        body = []
+        for i, row_labels in enumerate(labels):
+            th = "".join("<th>{}</th>".format(escape(str(x))) 
+                         for x in row_labels)
+            body.append("<tr>{}{}</tr>".format(th, self._rows[start + i]))
+        caption = ""
+        if self.num_pages > 1:
+            caption = ("<caption>Rows {}-{} of {} (page {} of {})"
+                       "</caption>".format(start + 1, stop, len(self.df),
+                                           page + 1, self.num_pages))
+        return ('<style>{}</style><table id="{}">{}{}<tbody>{}</tbody>'
+                '</table>'.format(self._css, self.uid, caption, 
+                                  self._header_html(), "".join(body)))
+    
+    def _repr_html_(self):
+        return self.page_html()
+    
+    def widget(self):
+        """Widget displaying the table page by page, with page controls
+        
+        Returns
+        -------
+        VBox
+            ipywidgets box containing the HTML of the current page, buttons
+            for the previous and next page and the page number
+        """
+        import ipywidgets as ipw
+        html = ipw.HTML(self.page_html())
+        btn_prev = ipw.Button(description="<", layout=ipw.Layout(width='40px'))
+        btn_next = ipw.Button(description=">", layout=ipw.Layout(width='40px'))
+        info = ipw.Label()
+        
+        def show(page):
+            self.page = min(max(page, 0), self.num_pages - 1)
+            html.value = self.page_html()
+            info.value = "Page {} of {}".format(self.page + 1, self.num_pages)
+            btn_prev.disabled = self.page == 0
+            btn_next.disabled = self.page == self.num_pages - 1
+        
+        btn_prev.on_click(lambda b: show(self.page - 1))
+        btn_next.on_click(lambda b: show(self.page + 1))
+        show(self.page)
+        return ipw.VBox([html, ipw.HBox([btn_prev, btn_next, info])])
+    
+    def save(self, fpath, all_pages=True):
+        """Save HTML table to file
+        
+        Parameters
+        ----------
+        fpath : str
+            output file
+        all_pages : bool
+            if True, all rows are written into one table, else only current
+            page
+        """
+        page_size = self.page_size
+        if all_pages:
+            self.page_size = None
+        try:
+            html = self.page_html(0 if all_pages else None)
+        finally:
+            self.page_size = page_size
+        with open(fpath, "w") as f:
+            f.write(html)
+        
 ### other helpers, math stuff
 def exponent(num):
     """Get exponent of input number
@@ -674,8 +2685,6 @@ if __name__ == "__main__":
     concat = pd.concat([df0, df1], axis=0)
     df0.head()
     
-    from glob import glob
-    
     xlspath = glob("./data/michael_ascii_read/*.xlsx", recursive=True)[0]
     
     var_info = read_var_info_michaels_excel(xlspath)
@@ -703,6 +2712,9 @@ if __name__ == "__main__":
     
     var_info_load = load_varinfo_dict_csv('data/var_info.csv')
     
+    print(compare_memory_layouts(files, var_info_load, 
+                                 replace_runid_prefix="Run"))
+    
     import pandas, io
     
         
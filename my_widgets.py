@@ -1,4 +1,6 @@
 import os
+import warnings
+import weakref
 from collections import OrderedDict as od
 import ipywidgets as ipw
 from copy import deepcopy
@@ -14,8 +16,388 @@ import helper_funcs as helpers
 from traceback import format_exc
 import numpy as np
 import matplotlib.pyplot as plt
+import asyncio
 
 
+class RenderScheduler(object):
+    """Debounced execution of render functions
+    
+    Render requests are collected and executed once the UI has been idle 
+    for ``delay`` seconds, i.e. a burst of UI events results in one render
+    per key. Renders are scheduled on the event loop of the kernel (the 
+    thread that handles widget events), since output widgets can only be 
+    updated reliably from that thread. If no event loop is running (e.g. 
+    outside a notebook), renders are executed immediately.
+    
+    Parameters
+    ----------
+    delay : float
+        idle time in s before pending renders are executed (if 0, renders
+        are executed immediately)
+    on_error : callable, optional
+        called with traceback string if a render function fails
+    """
+    def __init__(self, delay=0.1, on_error=None):
+        self.delay = delay
+        self.on_error = on_error
+        self._pending = od()
+        self._handle = None
+        
+    @staticmethod
+    def _running_loop():
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        
+    def schedule(self, key, fun):
+        """Request execution of render function
+        
+        Parameters
+        ----------
+        key : str
+            ID of render job (earlier pending request with the same key is 
+            replaced)
+        fun : callable
+            render function
+        """
+        self._pending.pop(key, None)
+        self._pending[key] = fun
+        self._cancel_handle()
+        loop = self._running_loop() if self.delay > 0 else None
+        if loop is None:
+            self.flush()
+        else:
+            self._handle = loop.call_later(self.delay, self.flush)
+    
+    def _cancel_handle(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+            
+    def flush(self):
+        """Execute all pending render functions"""
+        self._cancel_handle()
+        pending = list(self._pending.values())
+        self._pending.clear()
+        for fun in pending:
+            try:
+                fun()
+            except Exception:
+                if self.on_error is None:
+                    raise
+                self.on_error(format_exc())
+    
+    def cancel(self, key):
+        """Remove pending render request"""
+        self._pending.pop(key, None)
+        if not self._pending:
+            self._cancel_handle()
+    
+    @property
+    def num_pending(self):
+        """Number of pending render functions"""
+        return len(self._pending)
+
+class FrameMetadata(object):
+    """Metadata of a Dataframe used by the widgets (computed once)
+    
+    Unique values of index levels (e.g. variables, runs) and flagged 
+    variables are computed from the codes of the index on first access and 
+    then cached. Instances are shared between widgets, use :func:`of` to
+    get the instance of a Dataframe (it is stored as attribute of the 
+    Dataframe object, which is not passed on to Dataframes created from it).
+    The cache is tied to the index object of the Dataframe and is reset 
+    if the index is replaced (e.g. by ``rename(..., inplace=True)`` or 
+    ``set_index(..., inplace=True)``), flagged values are also recomputed 
+    if column Flag is replaced (e.g. ``df["Flag"] = ...``). Edits of single
+    values of column Flag (e.g. ``df.loc[..., "Flag"] = ...``) are not 
+    detected, use :func:`invalidate` after such edits. The Dataframe is 
+    referenced weakly.
+    
+    Parameters
+    ----------
+    df : DataFrame
+        table
+    """
+    def __init__(self, df):
+        self._df = weakref.ref(df)
+        self._index = df.index
+        self._uniques = {}
+        self._flagged = {}
+        self._flag_array = None
+        
+    @property
+    def df(self):
+        """Dataframe"""
+        df = self._df()
+        if df is None:
+            raise AttributeError("Dataframe of metadata no longer exists")
+        return df
+    
+    @property
+    def index(self):
+        """Current index of Dataframe (resets cache if index was replaced)"""
+        index = self.df.index
+        if not index is self._index:
+            self._index = index
+            self._uniques = {}
+            self._flagged = {}
+        return index
+    
+    @classmethod
+    def of(cls, df):
+        """Shared metadata instance of Dataframe"""
+        meta = df.__dict__.get("_frame_metadata")
+        if meta is None or meta._df() is not df:
+            meta = cls(df)
+            # bypass attribute handling of pandas (column access)
+            object.__setattr__(df, "_frame_metadata", meta)
+        return meta
+    
+    def invalidate(self):
+        """Reset cached values (e.g. after in-place edits of Dataframe)"""
+        self._uniques = {}
+        self._flagged = {}
+        self._flag_array = None
+    
+    def _level_num(self, level):
+        # accessing index resets cache if index was replaced
+        names = list(self.index.names)
+        if isinstance(level, str):
+            return names.index(level)
+        return level
+    
+    def _unique_codes(self, level_num, mask=None):
+        index = self.index
+        if not isinstance(index, pd.MultiIndex):
+            codes, uniques = pd.factorize(index)
+            if mask is not None:
+                codes = codes[mask]
+            return uniques.take(pd.unique(codes[codes >= 0])).values
+        codes = np.asarray(index.codes[level_num])
+        if mask is not None:
+            codes = codes[mask]
+        uniq = pd.unique(codes)
+        return index.levels[level_num].take(uniq[uniq >= 0]).values
+    
+    def uniques(self, level):
+        """Unique values of index level (in order of appearance)
+        
+        Parameters
+        ----------
+        level : int or str
+            index level
+        """
+        level_num = self._level_num(level)
+        if not level_num in self._uniques:
+            self._uniques[level_num] = self._unique_codes(level_num)
+        return self._uniques[level_num]
+    
+    def variables(self, level="Variable"):
+        """Unique variables"""
+        return self.uniques(level)
+    
+    def runs(self, level="Run"):
+        """Unique runs"""
+        return self.uniques(level)
+    
+    def flagged(self, level="Variable"):
+        """Unique values of index level in rows where column Flag is True"""
+        level_num = self._level_num(level)
+        values = self.df["Flag"].values
+        # array holding the data of column Flag (changes only if column is
+        # replaced), referenced weakly
+        arr = values
+        while isinstance(arr, np.ndarray) and isinstance(arr.base, np.ndarray):
+            arr = arr.base
+        if self._flag_array is None or self._flag_array() is not arr:
+            self._flag_array = weakref.ref(arr)
+            self._flagged = {}
+        if not level_num in self._flagged:
+            self._flagged[level_num] = self._unique_codes(
+                level_num, np.asarray(values).astype(bool))
+        return self._flagged[level_num]
+    
+    def flagged_set(self, level="Variable"):
+        """Set of flagged values (cf. :func:`flagged`)"""
+        return frozenset(self.flagged(level))
+    
+class PagedVariableSelector(object):
+    """Selection widget for long lists of variables
+    
+    Only the variables of the current page (among those matching the search
+    string) are sent to the frontend, as options of one SelectMultiple 
+    widget. The selection is stored as a boolean mask over all variables, so
+    bulk operations (e.g. :func:`select_all`) update one array and the 
+    current page only. Has the same interface as SelectMultiple (attributes
+    ``value`` and ``options``, method ``observe``); the widget for display 
+    is :attr:`widget`.
+    
+    Parameters
+    ----------
+    options : list
+        all variables
+    value : list
+        initially selected variables
+    page_size : int
+        number of variables per page
+    layout : Layout, optional
+        layout of selection list
+    """
+    def __init__(self, options, value=(), page_size=50, layout=None):
+        self._options = np.array(list(options), dtype=object)
+        self._search_vals = np.array([str(x).lower() for x in self._options])
+        self.mask = np.zeros(len(self._options), dtype=bool)
+        self.page_size = page_size
+        self.page = 0
+        self._matches = np.arange(len(self._options))
+        self._handlers = []
+        self._updating = False
+        
+        if layout is None:
+            layout = ipw.Layout(width='250px', height='200px')
+        self.search = ipw.Text(value='', placeholder='Search', 
+                               layout=ipw.Layout(width=layout.width))
+        self.selector = ipw.SelectMultiple(options=(), value=(), 
+                                           layout=layout)
+        self.btn_prev = ipw.Button(description="<", 
+                                   layout=ipw.Layout(width='40px'))
+        self.btn_next = ipw.Button(description=">", 
+                                   layout=ipw.Layout(width='40px'))
+        self.info = ipw.Label()
+        
+        self.search.observe(self.on_search, names="value")
+        self.selector.observe(self.on_page_selection, names="value")
+        self.btn_prev.on_click(self.on_prev)
+        self.btn_next.on_click(self.on_next)
+        
+        self.widget = ipw.VBox([self.search, 
+                                self.selector, 
+                                ipw.HBox([self.btn_prev, 
+                                          self.btn_next, 
+                                          self.info])])
+        self.value = value
+    
+    @property
+    def options(self):
+        """All variables"""
+        return tuple(self._options)
+    
+    @property
+    def value(self):
+        """Selected variables (in order of :attr:`options`)"""
+        return tuple(self._options[self.mask])
+    
+    @value.setter
+    def value(self, value):
+        old = self.value
+        self.mask = np.isin(self._options, np.array(list(value), 
+                                                    dtype=object))
+        self.refresh()
+        self._notify(old)
+        
+    @property
+    def num_pages(self):
+        """Number of pages of variables matching the search string"""
+        return max(1, -(-len(self._matches) // self.page_size))
+    
+    def _page_indices(self):
+        start = self.page * self.page_size
+        return self._matches[start:start + self.page_size]
+    
+    def observe(self, handler):
+        """Register function called when selection changes
+        
+        The function is called with a dictionary (keys name, old, new, 
+        owner) as for ipywidgets.
+        """
+        self._handlers.append(handler)
+    
+    def _notify(self, old):
+        new = self.value
+        if old == new:
+            return
+        for handler in self._handlers:
+            handler(dict(name="value", old=old, new=new, owner=self))
+            
+    def refresh(self):
+        """Update options and selection of displayed page"""
+        idx = self._page_indices()
+        names = tuple(self._options[idx])
+        self._updating = True
+        try:
+            if self.selector.options != names:
+                self.selector.options = names
+            self.selector.value = tuple(self._options[idx[self.mask[idx]]])
+        finally:
+            self._updating = False
+        self.info.value = ("Page {}/{}, {} matches, {} selected".format(
+            self.page + 1, self.num_pages, len(self._matches), 
+            self.mask.sum()))
+    
+    def filter(self, text):
+        """Show only variables that contain input string (case insensitive)"""
+        if text:
+            hits = np.char.find(self._search_vals, text.lower()) >= 0
+            self._matches = np.flatnonzero(hits)
+        else:
+            self._matches = np.arange(len(self._options))
+        self.page = 0
+        self.refresh()
+    
+    def set_page(self, page):
+        """Display page of variables"""
+        self.page = min(max(page, 0), self.num_pages - 1)
+        self.refresh()
+        
+    def select_all(self, matches_only=True):
+        """Select all variables (by default only those matching search)"""
+        old = self.value
+        if matches_only:
+            self.mask[self._matches] = True
+        else:
+            self.mask[:] = True
+        self.refresh()
+        self._notify(old)
+        
+    def unselect_all(self, matches_only=True):
+        """Unselect all variables (by default only those matching search)"""
+        old = self.value
+        if matches_only:
+            self.mask[self._matches] = False
+        else:
+            self.mask[:] = False
+        self.refresh()
+        self._notify(old)
+        
+    def on_search(self, change):
+        self.filter(change["new"])
+        
+    def on_page_selection(self, change):
+        if self._updating:
+            return
+        old = self.value
+        idx = self._page_indices()
+        self.mask[idx] = np.isin(self._options[idx], 
+                                 np.array(list(change["new"]), dtype=object))
+        self.refresh()
+        self._notify(old)
+        
+    def on_prev(self, b):
+        self.set_page(self.page - 1)
+        
+    def on_next(self, b):
+        self.set_page(self.page + 1)
+        
+    def __call__(self):
+        return self.widget
+    
+def _set_options(widget, options):
+    """Set options of selection widget (only if they changed)"""
+    options = tuple(options)
+    if tuple(widget.options) != options:
+        widget.options = options
 
 ### WORKING
 class TableEditor(object):        
@@ -24,6 +406,7 @@ class TableEditor(object):
     def __init__(self, df, save_dir=None, preconfig_file=None, 
                  default_group=None, new_run_names=[], add_to_index_vars=[], 
                  unstack_indices=[], run_level_idx=0, var_level_idx=2, 
+                 history_cache_size=2, render_delay=0.1, preview_rows=5,
                  **plot_settings):
         
         # Stuff for I/O
@@ -40,8 +423,19 @@ class TableEditor(object):
         
         # the dataframe
         self.df = df
-        self.df_edit = self.check_shape_init(df)
-        self._df_edit_last = self.df_edit
+        # edit history: list of operations applied to base Dataframe, only
+        # the base and the most recent results are kept in memory
+        self.history_cache_size = history_cache_size
+        self._base = self.check_shape_init(df)
+        self._ops = []
+        self._pos = 0
+        self._results = od([(0, self._base)])
+        # derived properties of current Dataframe (cf. _derived)
+        self._derived_df = None
+        self._derived_vals = {}
+        self._render = RenderScheduler(render_delay, 
+                                       on_error=self._on_render_error)
+        self.preview_rows = preview_rows
         
         self.extractions = od()
         
@@ -62,7 +456,8 @@ class TableEditor(object):
         self.groups = od()
         self.groups["flagged"] = self.flagged_vars
         if preconfig_file:
-            self.groups.update(helpers.load_varconfig_ini(preconfig_file))
+            self.groups.update(helpers.VariableRegistry.shared(
+                varconfig_ini=preconfig_file).groups)
         
         if default_group is None:
             default_group = "flagged"
@@ -89,7 +484,6 @@ class TableEditor(object):
         self.add_to_index(self.add_to_index_vars)
         self.unstack(self.unstack_indices)
         self.update_ui()
-        self.disp_current()
         
         self.heatmap_settings.update(plot_settings)
          
@@ -99,20 +493,73 @@ class TableEditor(object):
                                        "feature. Until then, you can use save "
                                        "button")
         
+    @property
+    def df_edit(self):
+        """Current Dataframe
+        
+        Result of applying all operations of the edit history (up to the 
+        current position) to the base Dataframe. Results that are not in 
+        memory are recomputed from the closest stored result.
+        """
+        pos = self._pos
+        if not pos in self._results:
+            start = max(k for k in self._results if k <= pos)
+            df = self._results[start]
+            for name, kwargs in self._ops[start:pos]:
+                df = getattr(self, "_op_" + name)(df, **kwargs)
+            # not stored if history_cache_size is 0
+            self._store_result(pos, df)
+            return df
+        elif pos != 0:
+            self._results.move_to_end(pos)
+        return self._results[pos]
+    
+    @df_edit.setter
+    def df_edit(self, df):
+        """Set new base Dataframe (edit history is cleared)"""
+        self._base = self.check_shape_init(df)
+        self._ops = []
+        self._pos = 0
+        self._results = od([(0, self._base)])
+    
+    @property
+    def history(self):
+        """List of applied operations (names), up to current position"""
+        return [name for name, _ in self._ops[:self._pos]]
+    
     @property 
     def default_plot_fun(self):
         return self.plot_funs["heatmap"]
     
+    def _derived(self, name, fun):
+        """Value of derived property, computed once per current Dataframe
+        
+        Parameters
+        ----------
+        name : str
+            name of property
+        fun : callable
+            function that computes the property from the Dataframe
+        """
+        df = self.df_edit
+        if self._derived_df is not df:
+            self._derived_vals = {}
+            self._derived_df = df
+        if not name in self._derived_vals:
+            self._derived_vals[name] = fun(df)
+        return self._derived_vals[name]
+    
     @property
     def column_names(self):
-        return list(self.df_edit.columns)
+        return self._derived("column_names", lambda df: list(df.columns))
     
     @property
     def data_column_names(self):
-        df = self.df_edit
-        if isinstance(df.columns, pd.MultiIndex):
-            return list(df.columns.levels[0])
-        return list(df.columns)
+        def fun(df):
+            if isinstance(df.columns, pd.MultiIndex):
+                return list(df.columns.levels[0])
+            return list(df.columns)
+        return self._derived("data_column_names", fun)
     
     @property
     def index_level_names(self):
@@ -125,17 +572,15 @@ class TableEditor(object):
     @property
     def run_names(self):
         #return sorted(self.df.index.get_level_values(self.level).unique().values)
-        return self.df_edit.index.get_level_values(self.run_level_idx).unique().values
+        return FrameMetadata.of(self.df_edit).uniques(self.run_level_idx)
     
     @property
     def flagged_vars(self):
-        lvl = self.var_level_idx
-        return list(self.df[self.df.Flag.astype(bool)].index.get_level_values(lvl).unique().values)
+        return list(FrameMetadata.of(self.df).flagged(self.var_level_idx))
 
     @property
     def all_variables(self):
-        lvl = self.var_level_idx
-        return self.df.index.get_level_values(lvl).unique().values
+        return FrameMetadata.of(self.df).uniques(self.var_level_idx)
     
     def init_glob_widgets(self):
         self.disp_table = ipw.Output()
@@ -150,6 +595,16 @@ class TableEditor(object):
                                layout=ipw.Layout(width=self._btn_width))
         btn_reset.on_click(self.on_reset)        
         
+        btn_undo = ipw.Button(description="Undo", 
+                              tooltip="Undo last change",
+                              layout=ipw.Layout(width=self._btn_width))
+        btn_undo.on_click(self.on_undo)
+        
+        btn_redo = ipw.Button(description="Redo", 
+                              tooltip="Redo last undone change",
+                              layout=ipw.Layout(width=self._btn_width))
+        btn_redo.on_click(self.on_redo)
+        
         tip = ("Save file in {} using filename specified in line above. "
                "Allowed filetypes are: {}".format(self.save_dir, 
                                        list(self.saveas_funs.keys())))
@@ -174,6 +629,8 @@ class TableEditor(object):
         self.btn_saveas = btn_saveas
         self.glob_toolbar = ipw.HBox([btn_clear_output, 
                                       btn_reset, 
+                                      btn_undo,
+                                      btn_redo,
                                       btn_save,
                                       btn_saveas,
                                       btn_plot])
@@ -240,10 +697,9 @@ class TableEditor(object):
         self.btn_apply_varselect = ipw.Button(description='Apply')
         self.btn_apply_varselect.style.button_color = 'lightgreen'
 
-        self.var_selector = ipw.SelectMultiple(description='', 
-                                               options=self.all_variables, 
-                                               value=self.default_selection, 
-                                               layout=self._base_layout)
+        self.var_selector = PagedVariableSelector(
+            options=self.all_variables, value=self.default_selection, 
+            layout=self._base_layout)
         
         self.var_selector_disp = ipw.Textarea(value='', 
                                          description='', 
@@ -275,7 +731,7 @@ class TableEditor(object):
                                         self.btn_apply_varselect])
         l = ipw.HBox([ipw.VBox([ipw.Label("Predefined"), self.group_selector]),
                       ipw.VBox([ipw.Label("Index level {}".format(self.var_level_idx)), 
-                                self.var_selector]), 
+                                self.var_selector.widget]), 
                       ipw.VBox([ipw.Label("Current selection"), 
                                 self.var_selector_disp]), 
                       self.btns_varselect])
@@ -347,7 +803,7 @@ class TableEditor(object):
         extract_btn_undo = ipw.Button(description="Undo", 
                                      layout=ipw.Layout(width=self._btn_width))
         extract_btn_undo.on_click(self.on_extract_undo)
-        extract_btn_undo.tooltip = "Undo last column extraction"
+        extract_btn_undo.tooltip = "Undo last change (e.g. column extraction)"
         
         extract_layout = ipw.VBox([extract_header,
                                    self.extract_select,
@@ -366,17 +822,17 @@ class TableEditor(object):
     # Methods for renamer
     def on_click_apply_rename(self, b):
         self.apply_changes_rename()
-        self.disp_current()   
+        self.request_render()
         
     def apply_changes_rename(self):
         
-        df = self.df_edit
         mapping = od()
         
         for i, name in enumerate(self.run_names):
             repl = str(self.input_fields_rename[i].value)
             mapping[name] = repl
-        self.df_edit = df.rename(index=mapping, level=self.run_level_idx)
+        self.apply_operation("rename", mapping=mapping, 
+                             level=self.run_level_idx)
         self.output.append_display_data("Applying renaming: {}".format(mapping))
     # Methods for variable selector
     def on_unselect_all_vars_clicked(self, b):
@@ -389,10 +845,10 @@ class TableEditor(object):
         self.select_current_group()
         
     def unselect_all(self):
-        self.var_selector.value = ()
+        self.var_selector.unselect_all(matches_only=False)
     
     def select_all(self):
-        self.var_selector.value = self.var_selector.options
+        self.var_selector.select_all(matches_only=False)
     
     def select_current_group(self):
         self.var_selector.value = self.group_selector.value
@@ -405,16 +861,15 @@ class TableEditor(object):
         
     def crop_var_selection(self):
         try:
-            self.df_edit = helpers.crop_selection_dataframe(self.df_edit, 
-                                                            self.var_selector.value, 
-                                                            levels=self.var_level_idx)
+            self.apply_operation("crop", values=self.var_selector.value, 
+                                 level=self.var_level_idx)
             self.output.append_display_data("Applying variable selection: {}".format(self.var_selector.value))
         except Exception as e:
             self.output.append_display_data("WARNING: failed to extract selection.\nTraceback {}".format(format_exc()))
     
     def on_click_apply_varselect(self, b):
         self.crop_var_selection()
-        self.disp_current()
+        self.request_render()
         
     # Methods for reshaper
     def update_ui(self):
@@ -434,7 +889,7 @@ class TableEditor(object):
                 self.btn_apply_varselect.disabled = True
                 self.btn_apply_varselect.tooltip = tip
             else:
-                self.col2idx_select.options = self.column_names
+                _set_options(self.col2idx_select, self.column_names)
                 self.col2idx_select.value=()
                 self.col2idx_select.disabled = False
                 for item in self.input_fields_rename:
@@ -445,16 +900,15 @@ class TableEditor(object):
                 self.btn_apply_rename.tooltip = tip
                 self.btn_apply_varselect.tooltip = tip
             
-            self.unstack_select.options = self.index_level_names
+            _set_options(self.unstack_select, self.index_level_names)
             self.unstack_select.value = ()
             
-            self.stack_select.options = self.index_level_col_names
+            _set_options(self.stack_select, self.index_level_col_names)
             self.stack_select.value = ()
             
-            self.extract_select.options = self.data_column_names
+            _set_options(self.extract_select, self.data_column_names)
             
-        self.disp_table.clear_output()
-        self.disp_current()
+        self.request_render()
         
     def on_add_col(self, b):
         var_names = list(self.col2idx_select.value)
@@ -473,21 +927,16 @@ class TableEditor(object):
        
     def on_extract(self, b):
         val = str(self.extract_select.value)
-        self._df_edit_last = self.df_edit
-        self.df_edit = self.df_edit[val]
+        self.apply_operation("extract", column=val)
         self.update_ui()
         self.freeze_ui()
-        self.disp_current()
         
     def freeze_ui(self, disable=True):
         for btn in self._buttons_edit_df:
             btn.disabled = disable
             
     def on_extract_undo(self, b):
-        self.df_edit = self._df_edit_last
-        self.update_ui()
-        self.freeze_ui(False)
-        self.disp_current()
+        self.on_undo(b)
         
     # global events
     def on_clear_output(self, b):
@@ -502,6 +951,17 @@ class TableEditor(object):
     def on_reset(self, b):
         self.reset()
         self.update_ui()
+        self.freeze_ui(isinstance(self.df_edit, pd.Series))
+        
+    def on_undo(self, b):
+        self.undo()
+        self.update_ui()
+        self.freeze_ui(isinstance(self.df_edit, pd.Series))
+        
+    def on_redo(self, b):
+        self.redo()
+        self.update_ui()
+        self.freeze_ui(isinstance(self.df_edit, pd.Series))
     
     def on_plot(self, b):
         self.plot()
@@ -510,30 +970,128 @@ class TableEditor(object):
         if isinstance(df.columns, pd.MultiIndex):
             #print("Initial Dataframe is unstacked, stacking back")
             return helpers.stack_dataframe_original_idx(df)
-        return deepcopy(df)
+        # operations do not modify their input, so no copy is needed
+        return df.copy(deep=False)
+    
+    def _store_result(self, pos, df):
+        self._results[pos] = df
+        stored = [k for k in self._results if k != 0]
+        for k in stored[:max(len(stored) - self.history_cache_size, 0)]:
+            del self._results[k]
+    
+    def apply_operation(self, name, **kwargs):
+        """Apply operation to current Dataframe and add it to edit history
+        
+        Operations that were undone before are discarded.
+        
+        Parameters
+        ----------
+        name : str
+            name of operation (e.g. rename, crop, unstack, cf. methods 
+            starting with ``_op_``)
+        **kwargs
+            input arguments of operation
+        
+        Returns
+        -------
+        DataFrame
+            new current Dataframe
+        """
+        df = getattr(self, "_op_" + name)(self.df_edit, **kwargs)
+        del self._ops[self._pos:]
+        for k in [k for k in self._results if k > self._pos]:
+            del self._results[k]
+        self._ops.append((name, kwargs))
+        self._pos += 1
+        self._store_result(self._pos, df)
+        return df
+    
+    @staticmethod
+    def _op_rename(df, mapping, level):
+        return df.rename(index=mapping, level=level)
+    
+    @staticmethod
+    def _op_crop(df, values, level):
+        return helpers.crop_selection_dataframe(df, values, levels=level)
+    
+    @staticmethod
+    def _op_add_to_index(df, var_names):
+        for item in var_names:
+            df = df.set_index([df.index, item])
+        return df
+    
+    @staticmethod
+    def _op_unstack(df, level_names):
+        return df.unstack(level_names)
+    
+    @staticmethod
+    def _op_stack(df, level_names):
+        return helpers.stack_dataframe(df, level_names)
+    
+    @staticmethod
+    def _op_extract(df, column):
+        return df[column]
     
     def add_to_index(self, var_names):
         if isinstance(var_names, str):
             var_names = [var_names]
-        for item in var_names:
-            self.df_edit = self.df_edit.set_index([self.df_edit.index, item])
+        if len(var_names) > 0:
+            self.apply_operation("add_to_index", var_names=list(var_names))
     
     def unstack(self, level_names):
-        self.df_edit = self.df_edit.unstack(level_names)
+        if len(level_names) > 0:
+            self.apply_operation("unstack", level_names=level_names)
         
     def stack(self, level_names):
-        self.df_edit = helpers.stack_dataframe(self.df_edit, level_names)
+        self.apply_operation("stack", level_names=level_names)
+    
+    def undo(self):
+        """Go back one step in edit history
+        
+        Returns
+        -------
+        bool
+            False if there was nothing to undo
+        """
+        if self._pos == 0:
+            return False
+        self._pos -= 1
+        return True
+    
+    def redo(self):
+        """Go forward one step in edit history
+        
+        Returns
+        -------
+        bool
+            False if there was nothing to redo
+        """
+        if self._pos == len(self._ops):
+            return False
+        self._pos += 1
+        return True
         
     def reset(self):
-        self.df_edit = self.check_shape_init(self.df)
+        """Go back to initial Dataframe (can be redone step by step)"""
+        self._pos = 0
           
+    def request_render(self):
+        """Request (debounced) update of preview table"""
+        self._render.schedule("preview", self.disp_current)
+    
+    def _on_render_error(self, tb):
+        self.output.append_display_data("Failed to render preview: "
+                                        "{}".format(tb))
+        
     def disp_current(self):
         #self.output.append_display_data(ipw.Label("PREVIEW current selection", fontsize=22))
-        self.disp_table.clear_output()
-        if isinstance(self.df_edit, pd.Series):
-            disp = self.df_edit
+        self.disp_table.outputs = ()
+        # only first rows are styled
+        head = self.df_edit.head(self.preview_rows)
+        if isinstance(head, pd.Series):
+            disp = head
         else:
-            disp = self.df_edit.head().style.set_caption("PREVIEW")
+            disp = head.style.set_caption("PREVIEW")
         self.disp_table.append_display_data(disp)
         #self.disp_table.append_display_data(preview)
         #self.output
@@ -547,7 +1105,9 @@ class TableEditor(object):
                                             "message: {}".format(repr(e)))
         
     def plot(self):
-        self.disp_table.clear_output()
+        # pending preview would replace the plot
+        self._render.cancel("preview")
+        self.disp_table.outputs = ()
         with self.disp_table:
             fig, ax = plt.subplots(1,1, figsize=(14, 8))
             self.plot_heatmap(ax=ax)
@@ -634,7 +1194,7 @@ class IndexRenamer(object):
     @property
     def names(self):
         #return sorted(self.df.index.get_level_values(self.level).unique().values)
-        return self.df.index.get_level_values(self.level).unique().values
+        return FrameMetadata.of(self.df).uniques(self.level)
     @property
     def df_edit(self):
         return deepcopy(self._df_edit)
@@ -705,7 +1265,8 @@ class SelectVariable(object):
         self.groups = od()
         self.groups["flagged"] = self.flagged_vars
         if preconfig_file:
-            self.groups.update(helpers.load_varconfig_ini(preconfig_file))
+            self.groups.update(helpers.VariableRegistry.shared(
+                varconfig_ini=preconfig_file).groups)
         if default_group is None:
             default_group = "flagged"
         
@@ -714,7 +1275,7 @@ class SelectVariable(object):
             
         self.default_selection = self.groups[default_group]
         
-        self.vals = self.df.index.get_level_values(self.level).unique().values
+        self.vals = FrameMetadata.of(self.df).uniques(self.level)
         
         
         self._base_layout = ipw.Layout(flex='0 1 auto', 
@@ -737,7 +1298,7 @@ class SelectVariable(object):
     
     @property
     def flagged_vars(self):
-        return list(self.df[self.df.Flag].index.get_level_values(self.level).unique().values)
+        return list(FrameMetadata.of(self.df).flagged(self.level))
     
     def init_widgets(self):
         
@@ -1080,19 +1641,22 @@ class FileBrowser(object):
 ### UNDER DEVELOPMENT
 class SelectVariableNew(object):
     output = ipw.Output()
-    def __init__(self, df, num_cols=3):
+    def __init__(self, df, num_cols=None, page_size=50):
+        if num_cols is not None:
+            # variables are shown in one paged list (no columns)
+            warnings.warn("Input num_cols of SelectVariableNew is deprecated "
+                          "and ignored, use page_size", DeprecationWarning,
+                          stacklevel=2)
         #df.sort_index(inplace=True)
         self.df = df
         #self.vals = tuple(self.df.index.levels[2].values)
-        self.vals = self.df.index.get_level_values("Variable").unique().values
+        self.vals = FrameMetadata.of(self.df).variables()
         self._df_edit = df
-        self.num_cols = num_cols
+        self.page_size = page_size
         self.init_widgets()
         self.init_actions()
         self.init_layout()
         
-        #self.print_current(1)
-        self.highlight_selection(1)
         #self.crop_selection()
         self.disp_current()
     
@@ -1102,7 +1666,7 @@ class SelectVariableNew(object):
     
     @property
     def flagged_vars(self):
-        return list(self.df[self.df.Flag].index.get_level_values("Variable").unique().values)
+        return list(FrameMetadata.of(self.df).flagged())
     
     def init_widgets(self):
         
@@ -1112,21 +1676,11 @@ class SelectVariableNew(object):
         self.btn_apply = ipw.Button(description='Apply')
         self.btn_apply.style.button_color = 'lightgreen'
         
-        self.items = []
-        self.input_fields = []
-    
-        for num, name in enumerate(self.vals):
-            ipt = ipw.Button(description=name, disabled=True, layout=ipw.Layout(width='150px'))
-            order = ipw.Text(value=str(num+1), disabled=False, layout=ipw.Layout(width='50px'))
-            order.observe(self.on_change_input_field)
-            self.items.append(ipt)
-            self.input_fields.append(order)
-            
+        self.var_selector = PagedVariableSelector(self.vals, 
+                                                  page_size=self.page_size)
         #self.output = ipw.Output()
     
     def init_actions(self):
-        #what happens when the state of the selection is changed (display current selection)
-        #self.var_selector.observe(self.print_current)
         #what happens when buttons are clicked
         self.btn_select_all.on_click(self.on_select_all_vars_clicked)
         self.btn_unselect_all.on_click(self.on_unselect_all_vars_clicked)
@@ -1141,27 +1695,9 @@ class SelectVariableNew(object):
                               self.btn_flagged,
                               self.btn_apply])
         
-        self.init_input_area()
+        self.edit_area = self.var_selector.widget
         
         self.layout = ipw.VBox([self.btns, self.edit_area, self.output])
-        
-    def init_input_area(self):
-        
-        num_cols = self.num_cols
-        items = self.items
-        input_fields = self.input_fields
-    
-        col_vals = np.array_split(np.arange(len(items)), num_cols)
-        
-        cols = []
-        for ival in col_vals:
-            col_rows = []
-            for val in ival:
-                col_rows.append(ipw.HBox([items[val], input_fields[val]]))
-            cols.append(ipw.VBox(col_rows))
-            
-        self.edit_area = ipw.HBox(cols)
-
     
     def on_unselect_all_vars_clicked(self, b):
         self.unselect_all()
@@ -1172,34 +1708,14 @@ class SelectVariableNew(object):
     def on_flagged_clicked(self, b):
         self.select_flagged()
         
-    def on_change_input_field(self, b):
-        print(b.new.value)
-        
-    @property
-    def current_order(self):
-        nums = []
-        for item in self.input_fields:
-            nums.append(item.value)
-        
-    def highlight_selection(self, b):
-        for i, item in enumerate(self.input_fields):
-            try:
-                int(item.value)
-                self.items[i].style.button_color = "#e6ffee"
-            except:
-                self.items[i].style.button_color = "white"
-                
     def unselect_all(self):
-        pass
-        #self.var_selector.value = ()
+        self.var_selector.unselect_all()
     
     def select_all(self):
-        pass
-        #self.var_selector.value = self.var_selector.options
+        self.var_selector.select_all()
     
     def select_flagged(self):
-        pass
-        #self.var_selector.value = self.flagged_vars
+        self.var_selector.value = self.flagged_vars
         
     def disp_current(self):
         self.output.clear_output()
@@ -1208,7 +1724,11 @@ class SelectVariableNew(object):
         self.output
         
     def crop_selection(self):
-        raise NotImplementedError
+        try:
+            self._df_edit = helpers.crop_selection_dataframe(
+                self.df, list(self.var_selector.value), levels="Variable")
+        except Exception:
+            print("WARNING: failed to extract selection.\nTraceback {}".format(format_exc()))
     
     def on_click_apply(self, b):
         self.crop_selection()
@@ -1238,7 +1758,7 @@ class ReshapeAndSelect(object):
     
     @property
     def flagged_vars(self):
-        return list(self.df[self.df.Flag].index.get_level_values("Variable").unique().values)
+        return list(FrameMetadata.of(self.df).flagged())
     
     def init_widgets(self):
     
@@ -1248,11 +1768,9 @@ class ReshapeAndSelect(object):
         self.btn_apply = ipw.Button(description='Apply')
         self.btn_apply.style.button_color = 'lightgreen'
 
-        self.var_selector = ipw.SelectMultiple(description="Variables", 
-                                               options=self.vals, 
-                                               value=self.flagged_vars, 
-                                               min_width='150px',
-                                               layout=self.box_layout)
+        self.var_selector = PagedVariableSelector(
+            options=FrameMetadata.of(self.df).variables(), 
+            value=self.flagged_vars, layout=self.box_layout)
         
         self.current_disp = ipw.Textarea(value='', 
                                          description='Current:', 
@@ -1276,7 +1794,7 @@ class ReshapeAndSelect(object):
                               ipw.Label(),
                               self.btn_apply])
     
-        self.edit_area = ipw.HBox([self.var_selector, 
+        self.edit_area = ipw.HBox([self.var_selector.widget, 
                                    self.current_disp, 
                                    self.btns])
         
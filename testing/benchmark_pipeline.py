@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the NorESM diagnostics table pipeline in :mod:`helper_funcs`
+
+Synthesises diagnostics table files (same layout as the files in
+data/michael_ascii_read, i.e. ``TEST CASE:`` header followed by a
+``Variable`` table) for different numbers of runs and times each stage of
+the pipeline:
+
+    1. :func:`read_file_custom` (all files, one by one)
+    2. :func:`read_and_merge_all`
+    3. :func:`calc_and_add_relerror`
+    4. unstack and :func:`stack_dataframe`
+    5. :func:`crop_selection_dataframe`
+    6. :func:`df_to_heatmap` (Agg backend, at most HEATMAP_MAX_RUNS runs)
+
+For each stage, the wall time and the peak memory allocated by Python
+(:mod:`tracemalloc`, measured in a second call, since tracing slows down
+execution) are recorded. Results are written to a JSON report, so
+that throughput can be compared between versions.
+
+Usage (from repository root)::
+
+    python testing/benchmark_pipeline.py --runs 10 100 1000 10000 \
+        --out output/benchmark.json
+"""
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from collections import OrderedDict as od
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import helper_funcs as helpers
+
+#: default numbers of runs (one result file per run)
+RUNS = [10, 100, 1000, 10000]
+#: number of variables per result file (similar to real diagnostics tables)
+NUM_VARS = 100
+#: max number of runs shown in heatmap
+HEATMAP_MAX_RUNS = 20
+
+#: template of a diagnostics table file
+FILE_HEADER = ("DIAG SET 1: ANN MEANS GLOBAL\n \n"
+               "TEST CASE: {case} (yrs {years})\n \n"
+               "CONTROL CASE: OBS data\n \n"
+               "Variable    {case}       OBS data       {case}        RMSE\n"
+               "                                                     "
+               "-OBS data\n")
+
+def synthetic_variables(num_vars=NUM_VARS):
+    """Variable names and descriptions for synthetic result files
+
+    Includes the special cases :attr:`helper_funcs.OBS_ZERO_VAL` and
+    :attr:`helper_funcs.PROBLEM_VARS`
+
+    Returns
+    -------
+    OrderedDict
+        variable names (keys) and descriptions (values)
+    """
+    names = helpers.OBS_ZERO_VAL + helpers.PROBLEM_VARS
+    names += ["VAR{:03d}_OBS{}".format(i, i % 3) for i in
+              range(num_vars - len(names))]
+    return od((name, "Description of {}".format(name)) for name in names)
+
+def write_synthetic_files(out_dir, num_runs, variables, seed=42):
+    """Write one synthetic diagnostics table file per run
+
+    Parameters
+    ----------
+    out_dir : str
+        output directory
+    num_runs : int
+        number of files
+    variables : list
+        variable names
+    seed : int
+        seed of random number generator
+
+    Returns
+    -------
+    list
+        file paths
+    """
+    rng = np.random.RandomState(seed)
+    files = []
+    for run in range(num_runs):
+        case = "N1850_f19_tn14_bench{:05d}".format(run)
+        years = "{}-{}".format(run % 7 * 30 + 1, run % 7 * 30 + 30)
+        model = rng.uniform(0, 300, len(variables))
+        obs = model + rng.normal(0, 5, len(variables))
+        rmse = np.abs(rng.normal(5, 2, len(variables)))
+        lines = [FILE_HEADER.format(case=case, years=years)]
+        for i, var in enumerate(variables):
+            if var in helpers.OBS_ZERO_VAL:
+                vals = (model[i], -999, -999, -999)
+            else:
+                vals = (model[i], obs[i], model[i] - obs[i], rmse[i])
+            # problem variables are glued to the first value in real files
+            sep = "" if var in helpers.PROBLEM_VARS else "  "
+            lines.append("{:<16}{}{:8.3f}{:20.3f}{:18.3f}{:14.3f}\n".format(
+                var, sep, *vals))
+        fpath = os.path.join(out_dir, "{} (yrs {}).asc".format(case, years))
+        with open(fpath, "w") as f:
+            f.writelines(lines)
+        files.append(fpath)
+    return files
+
+def measure(fun, *args, **kwargs):
+    """Call function and measure wall time and peak memory
+
+    The function is called twice, first to measure the wall time, then with
+    :mod:`tracemalloc` enabled, to measure the peak memory.
+
+    Returns
+    -------
+    tuple
+        2-element tuple containing return value of function and OrderedDict
+        with measured wall time in s and peak memory in MB
+    """
+    gc.collect()
+    t0 = time.perf_counter()
+    result = fun(*args, **kwargs)
+    dt = time.perf_counter() - t0
+    gc.collect()
+    tracemalloc.start()
+    fun(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (result, od(time_s=dt, peak_mem_mb=peak / 1024**2))
+
+def _read_all_single(files, var_info_dict, engine):
+    return [helpers.read_file_custom(f, var_info_dict, engine=engine)
+            for f in files]
+
+def _heatmap(table):
+    ax = helpers.df_to_heatmap(table, table_name="Bias", figsize=(12, 6))
+    ax.figure.savefig(os.devnull, format="png")
+    plt.close(ax.figure)
+
+def benchmark_runs(num_runs, work_dir, var_info_dict, engine="python"):
+    """Run benchmark of all pipeline stages for one number of runs
+
+    Parameters
+    ----------
+    num_runs : int
+        number of runs (synthetic files)
+    work_dir : str
+        directory in which synthetic files are stored
+    var_info_dict : dict
+        variable names and descriptions
+    engine : str
+        parser engine (cf. :func:`helper_funcs.read_file_custom`)
+
+    Returns
+    -------
+    OrderedDict
+        results of all stages
+    """
+    out_dir = os.path.join(work_dir, "runs{}".format(num_runs))
+    os.mkdir(out_dir)
+    variables = list(var_info_dict.keys())
+    files = write_synthetic_files(out_dir, num_runs, variables)
+    stages = od()
+
+    _, stages["read_file_custom"] = measure(_read_all_single, files,
+                                            var_info_dict, engine)
+
+    merged, stages["read_and_merge_all"] = measure(
+        helpers.read_and_merge_all, files, var_info_dict,
+        replace_runid_prefix="Run", engine=engine)
+
+    merged, stages["calc_and_add_relerror"] = measure(
+        helpers.calc_and_add_relerror, merged, "RMSE", ["Run", "Years"])
+
+    unstacked = merged.unstack(["Run", "Years"])
+    _, stages["stack_dataframe"] = measure(helpers.stack_dataframe,
+                                           unstacked, ["Run", "Years"])
+
+    selection, stages["crop_selection_dataframe"] = measure(
+        helpers.crop_selection_dataframe, merged, variables[::10], "Variable")
+
+    runs = merged.index.get_level_values("Run").unique()[:HEATMAP_MAX_RUNS]
+    bias = helpers.crop_selection_dataframe(merged, list(runs), "Run")["Bias"]
+    bias = bias.unstack(["Run", "Years"])
+    _, stages["df_to_heatmap"] = measure(_heatmap, bias)
+
+    # throughput of heatmap is number of table cells per s
+    for name, stage in stages.items():
+        num = bias.size if name == "df_to_heatmap" else len(merged)
+        stage["rows_per_s"] = num / stage["time_s"]
+    shutil.rmtree(out_dir)
+    return od(num_runs=num_runs, num_files=len(files),
+              num_rows=len(merged), heatmap_runs=len(runs), stages=stages)
+
+def run_benchmark(runs=RUNS, engine="python", num_vars=NUM_VARS,
+                  verbose=True):
+    """Run benchmark for different numbers of runs
+
+    Returns
+    -------
+    OrderedDict
+        report (can be serialised to JSON)
+    """
+    var_info_dict = synthetic_variables(num_vars)
+    report = od(created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                python=platform.python_version(),
+                pandas=pd.__version__,
+                numpy=np.__version__,
+                platform=platform.platform(),
+                engine=engine,
+                num_vars=num_vars,
+                results=[])
+    work_dir = tempfile.mkdtemp(prefix="bench_noresm_")
+    try:
+        for num_runs in runs:
+            result = benchmark_runs(num_runs, work_dir, var_info_dict,
+                                    engine)
+            report["results"].append(result)
+            if verbose:
+                print("{} runs ({} rows)".format(num_runs,
+                                                 result["num_rows"]))
+                for name, stage in result["stages"].items():
+                    print("  {:<26}{:10.4f} s {:10.2f} MB".format(
+                        name, stage["time_s"], stage["peak_mem_mb"]))
+    finally:
+        shutil.rmtree(work_dir)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, nargs="+", default=RUNS,
+                        help="numbers of runs (files) to benchmark")
+    parser.add_argument("--engine", default="python",
+                        choices=["python", "fast"], help="parser engine")
+    parser.add_argument("--vars", type=int, default=NUM_VARS,
+                        help="number of variables per file")
+    parser.add_argument("--out", default="benchmark_pipeline.json",
+                        help="output path of JSON report")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.runs, args.engine, args.vars)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Saved report: {}".format(args.out))
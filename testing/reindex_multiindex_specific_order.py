@@ -10,7 +10,7 @@ import numpy as np
 
 np.random.seed(2018)
 index = pd.MultiIndex(levels=[[u'C', u'D', u'M'], [u'C', u'D', u'M']],
-           labels=[[0, 0, 0, 1, 1, 1, 2, 2, 2], [0, 1, 2, 0, 1, 2, 0, 1, 2]],
+           codes=[[0, 0, 0, 1, 1, 1, 2, 2, 2], [0, 1, 2, 0, 1, 2, 0, 1, 2]],
            names=[u'level0', u'level1'])
 
 df = pd.DataFrame(np.random.randint(10,size=(9,3)),
@@ -18,23 +18,40 @@ df = pd.DataFrame(np.random.randint(10,size=(9,3)),
 print (df)
 
 def reindex_order(df, new_order_list, level):
-    level_names = df.index.names
-    new_levels = []
+    """Remaps index codes and sorts rows (no Cartesian product)"""
+    idx = df.index
+    level_names = idx.names
+    new_levels, new_codes, sort_keys = [], [], []
     for i, name in enumerate(level_names):
-        #current unique values of level index
-        vals = df.index.get_level_values(name).unique().values
+        lev = idx.levels[i]
+        codes = np.asarray(idx.codes[i])
+        #current unique values of level index (codes in order of appearance)
+        uniq_codes = pd.unique(codes)
+        lut = np.full(len(lev), -1, dtype=np.intp)
         if name == level or i == level:
+            vals = lev.take(uniq_codes)
             if not len(new_order_list) == len(vals):
                 raise ValueError("Mismatch in lengths of input array and "
                                  "index array.")
-            elif not all([x in vals for x in new_order_list]):
+            elif (not len(set(new_order_list)) == len(new_order_list) or
+                  not set(new_order_list) == set(vals)):
                 raise NameError("Input list is not a permutation of current "
                                 "index at level {}".format(level))
-            new_levels.append(new_order_list)
+            lut[lev.get_indexer(new_order_list)] = np.arange(len(vals))
+            codes = lut[codes]
+            new_levels.append(pd.Index(new_order_list, name=name))
+            sort_keys.append(codes)
         else:
-            new_levels.append(vals)
-    new_idx = pd.MultiIndex.from_product(new_levels, names=level_names)
-    return df.reindex(new_idx)
+            lut[uniq_codes] = np.arange(len(uniq_codes))
+            new_levels.append(lev)
+            sort_keys.append(lut[codes])
+        new_codes.append(codes)
+    order = np.lexsort(sort_keys[::-1])
+    out = df.take(order)
+    out.index = pd.MultiIndex(levels=new_levels, 
+                              codes=[codes[order] for codes in new_codes], 
+                              names=level_names, verify_integrity=False)
+    return out
 
 L = list('CMD')
 names = df.index.names
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Round trip tests of :func:`helper_funcs.save_columnar` and
+:func:`helper_funcs.load_columnar`, including incremental re-saves of
+single runs into an existing dataset
+
+Run from repository root::
+
+    python -m pytest testing/test_columnar.py
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import helper_funcs as helpers
+
+pytest.importorskip("pyarrow")
+
+def result_table(seed=42):
+    """Result table with same layout as output of read_and_merge_all
+
+    Variables are not sorted, so that the row order within partitions
+    differs from the (Variable sorted) order in the files
+    """
+    rng = np.random.RandomState(seed)
+    variables = ["VAR{:02d}".format(i) for i in rng.permutation(20)]
+    rows = []
+    for run, years in [("Run1", "80-110"), ("Run2", "1-20"),
+                       ("Run3", "185-215"), ("Run4", "90-120")]:
+        for var in variables:
+            rows.append((run, years, var, "Description of {}".format(var)))
+    index = pd.MultiIndex.from_tuples(
+        rows, names=["Run", "Years", "Variable", "Description"])
+    return pd.DataFrame(rng.normal(size=(len(rows), 3)), index=index,
+                        columns=["Bias", "RMSE", "Flag"])
+
+def test_round_trip(tmp_path):
+    df = result_table()
+    helpers.save_columnar(df, str(tmp_path))
+    loaded = helpers.load_columnar(str(tmp_path))
+    pd.testing.assert_frame_equal(loaded, df)
+
+def test_incremental_resave(tmp_path):
+    df = result_table()
+    helpers.save_columnar(df, str(tmp_path))
+
+    updated = df.copy()
+    updated.loc["Run4", "Bias"] = updated.loc["Run4", "Bias"].values + 100
+    helpers.save_columnar(updated.loc[["Run4"]], str(tmp_path))
+
+    loaded = helpers.load_columnar(str(tmp_path))
+    pd.testing.assert_frame_equal(loaded, updated)
+
+    # re-save of run that was not the last partition
+    updated.loc["Run2", "RMSE"] = -1.0
+    helpers.save_columnar(updated.loc[["Run2"]], str(tmp_path))
+    loaded = helpers.load_columnar(str(tmp_path))
+    pd.testing.assert_frame_equal(loaded, updated)
+
+def test_load_selection(tmp_path):
+    df = result_table()
+    helpers.save_columnar(df, str(tmp_path))
+    variables = list(df.index.get_level_values("Variable")[:5])
+    loaded = helpers.load_columnar(str(tmp_path), variables=variables,
+                                   runs=["Run2", "Run3"], columns="Bias")
+    mask = (df.index.get_level_values("Variable").isin(variables) &
+            df.index.get_level_values("Run").isin(["Run2", "Run3"]))
+    pd.testing.assert_frame_equal(loaded, df.loc[mask, ["Bias"]])